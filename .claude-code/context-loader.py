@@ -2,46 +2,149 @@
 Claude Code Context Loader
 Loads project context for optimized prompt generation with credit-saving practices
 """
+import functools
+import io
 import json
 import os
+import sys
 from pathlib import Path
-from typing import Dict, List, Any, Union
+from typing import Dict, List, Any, Tuple, Union
+
+try:
+    import orjson  # Optional: faster hooks.json parsing
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
+# Buffer size for line-range reads (avoids the default 8KB read ping-pong)
+READ_BUFFER_SIZE = 128 * 1024
+
+# Characters of each example file included as a preview
+PREVIEW_CHARS = 500
+PREVIEW_HEADER = "  Preview:\n"
+
+
+def tokens_from_chars(char_count: int) -> int:
+    """Rough token estimation from a character count: ~4 characters per token."""
+    return char_count >> 2
 
 
 def estimate_tokens(text: str) -> int:
     """Rough token estimation: ~4 characters per token."""
-    return len(text) // 4
+    return tokens_from_chars(len(text))
+
+
+def _read_line_range(f, start_idx: int, end_idx: int, max_chars: int = None) -> str:
+    """Return lines [start_idx, end_idx) of a text stream without splitting it into lines.
+    
+    Scans newline offsets chunk by chunk and slices the chunks, matching
+    '\n'.join(content.split('\n')[start_idx:end_idx]).
+    """
+    if end_idx <= start_idx:
+        return ""
+    
+    pieces = []
+    collected = 0
+    newlines = 0
+    started = start_idx == 0
+    while True:
+        chunk = f.read(READ_BUFFER_SIZE)
+        if not chunk:
+            break
+        pos = 0
+        
+        # Skip to the first character after the start_idx-th newline
+        if not started:
+            chunk_newlines = chunk.count('\n')
+            if newlines + chunk_newlines < start_idx:
+                newlines += chunk_newlines
+                continue
+            while newlines < start_idx:
+                pos = chunk.index('\n', pos) + 1
+                newlines += 1
+            started = True
+        
+        # Collect up to (not including) the end_idx-th newline
+        remaining = end_idx - newlines
+        chunk_newlines = chunk.count('\n', pos)
+        if chunk_newlines < remaining:
+            pieces.append(chunk[pos:] if pos else chunk)
+            newlines += chunk_newlines
+        else:
+            stop = pos
+            for _ in range(remaining):
+                stop = chunk.index('\n', stop) + 1
+            pieces.append(chunk[pos:stop - 1])
+            break
+        
+        collected += len(pieces[-1])
+        if max_chars is not None and collected >= max_chars:
+            break
+    
+    return ''.join(pieces)
 
 
-def load_file_with_limits(file_path: Path, lines: str = None, max_size_kb: int = None) -> str:
-    """Load file with line range and size limits for credit saving."""
-    if not file_path.exists():
+def load_file_with_limits(file_path: Path, lines: str = None, max_size_kb: int = None,
+                          max_chars: int = None) -> str:
+    """Load file with line range and size limits for credit saving.
+    
+    max_chars caps how much is read, for callers that only need a prefix.
+    """
+    # Single stat() doubles as the existence check
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
         return ""
     
     # Check file size first
-    file_size_kb = file_path.stat().st_size / 1024
+    file_size_kb = st.st_size / 1024
     if max_size_kb and file_size_kb > max_size_kb:
         return f"[File too large: {file_size_kb:.1f}KB > {max_size_kb}KB limit - skipped]"
     
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-        content = f.read()
-    
-    # Apply line range if specified
-    if lines:
+    # Parse the line range up front so we only read as far as we need
+    line_range = None
+    if lines and '-' in lines:
         try:
-            if '-' in lines:
-                start, end = map(int, lines.split('-'))
-                lines_list = content.split('\n')
-                # Convert to 0-based indexing
-                start_idx = max(0, start - 1)
-                end_idx = min(len(lines_list), end)
-                content = '\n'.join(lines_list[start_idx:end_idx])
-        except (ValueError, IndexError):
+            start, end = map(int, lines.split('-'))
+            line_range = (max(0, start - 1), max(0, end))
+        except ValueError:
             pass  # If parsing fails, return full content
     
+    # A range starting at line 1 that ends past the byte count cannot cut anything
+    if line_range and line_range[0] == 0 and line_range[1] > st.st_size:
+        line_range = None
+    
+    if line_range:
+        start_idx, end_idx = line_range
+        with open(file_path, 'r', encoding='utf-8', errors='ignore', buffering=READ_BUFFER_SIZE) as f:
+            content = _read_line_range(f, start_idx, end_idx, max_chars)
+        return content[:max_chars] if max_chars is not None else content
+    
+    if max_chars is not None:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read(max_chars)
+    
+    buffering = max_size_kb * 1024 if max_size_kb else -1
+    with open(file_path, 'r', encoding='utf-8', errors='ignore', buffering=buffering) as f:
+        content = f.read()
+    
     return content
 
 
+@functools.lru_cache(maxsize=256)
+def _file_preview(path: str, lines: str, max_size_kb: int, mtime_ns: int, size: int) -> str:
+    """Preview of a file's content; mtime/size in the key invalidate stale entries."""
+    # One extra character tells us whether the preview was truncated
+    file_content = load_file_with_limits(Path(path), lines, max_size_kb, max_chars=PREVIEW_CHARS + 1)
+    if not file_content or file_content.startswith("[File too large"):
+        return ""
+    # At most PREVIEW_CHARS + 1 characters were read, so only slice when truncated
+    if len(file_content) > PREVIEW_CHARS:
+        return file_content[:PREVIEW_CHARS] + "\n[... truncated ...]"
+    return file_content
+
+
 class ContextLoader:
     """Loads and provides project context for Claude Code with credit-saving optimizations."""
     
@@ -50,16 +153,42 @@ class ContextLoader:
         self.hooks_file = self.project_root / ".claude-code" / "hooks.json"
         self.context_cache = {}
         self.credit_config = {}
+        self._hooks_cache = None
+        self._hooks_mtime = None
+        self._base_prompt_cache = None
+        self._resolved_paths: Dict[str, Path] = {}
     
     def load_hooks(self) -> Dict[str, Any]:
-        """Load hooks configuration."""
-        if self.hooks_file.exists():
-            with open(self.hooks_file, 'r') as f:
-                hooks = json.load(f)
-                # Cache credit-saving config
-                self.credit_config = hooks.get("credit_saving", {})
-                return hooks
-        return {}
+        """Load hooks configuration (memoized on hooks.json mtime)."""
+        try:
+            mtime = self.hooks_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        
+        if self._hooks_cache is not None and mtime == self._hooks_mtime:
+            return self._hooks_cache
+        
+        hooks = _json_loads(self.hooks_file.read_bytes())
+        
+        # Normalize legacy string entries so downstream code only sees dicts,
+        # and resolve each path once instead of on every prompt build
+        resolved_paths = {}
+        for hook_config in hooks.get("hooks", {}).values():
+            if "example_files" in hook_config:
+                example_files = []
+                for spec in hook_config["example_files"]:
+                    entry = {"path": spec} if isinstance(spec, str) else spec
+                    path = entry.get("path", "")
+                    resolved_paths[path] = self.project_root / path
+                    example_files.append(entry)
+                hook_config["example_files"] = example_files
+        
+        # Cache credit-saving config
+        self.credit_config = hooks.get("credit_saving", {})
+        self._resolved_paths = resolved_paths
+        self._hooks_cache = hooks
+        self._hooks_mtime = mtime
+        return hooks
     
     def get_project_context(self) -> Dict[str, Any]:
         """Get comprehensive project context."""
@@ -74,35 +203,46 @@ class ContextLoader:
             "workflow": "Interactive business-side coding"
         }
     
-    def get_relevant_files(self, feature_type: str) -> List[Union[str, Dict]]:
+    def get_relevant_files(self, feature_type: str) -> List[Dict]:
         """Get relevant example files for a feature type."""
         hooks = self.load_hooks()
         hook_config = hooks.get("hooks", {}).get(feature_type, {})
         return hook_config.get("example_files", [])
     
-    def load_file_content(self, file_spec: Union[str, Dict]) -> str:
+    def load_file_content(self, file_spec: Union[str, Dict], max_chars: int = None) -> str:
         """Load file content with credit-saving limits."""
         if isinstance(file_spec, str):
             # Legacy format: just a path
             file_path = self.project_root / file_spec
-            return load_file_with_limits(file_path)
+            return load_file_with_limits(file_path, max_chars=max_chars)
         elif isinstance(file_spec, dict):
             # New format: dict with path, lines, max_size_kb
             file_path = self.project_root / file_spec.get("path", "")
             lines = file_spec.get("lines")
             max_size_kb = file_spec.get("max_size_kb")
-            return load_file_with_limits(file_path, lines, max_size_kb)
+            return load_file_with_limits(file_path, lines, max_size_kb, max_chars)
         return ""
     
-    def build_prompt_context(self, task: str, feature_type: str = None) -> str:
-        """Build optimized prompt context for a task with credit-saving practices."""
-        # Check cache first
-        cache_key = f"{feature_type}:{task}"
-        if self.credit_config.get("cache_context") and cache_key in self.context_cache:
-            return self.context_cache[cache_key]
+    def load_file_preview(self, file_spec: Dict) -> str:
+        """Load a short content preview, cached until the file changes."""
+        path = file_spec.get("path", "")
+        file_path = self._resolved_paths.get(path) or self.project_root / path
+        lines = file_spec.get("lines")
+        max_size_kb = file_spec.get("max_size_kb")
+        
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            return ""
+        return _file_preview(str(file_path), lines, max_size_kb, st.st_mtime_ns, st.st_size)
+    
+    def _get_base_prompt(self) -> Tuple[str, int]:
+        """Build the task-independent prompt header (memoized on hooks.json mtime)."""
+        self.load_hooks()
+        if self._base_prompt_cache and self._base_prompt_cache[0] == self._hooks_mtime:
+            return self._base_prompt_cache[1], self._base_prompt_cache[2]
         
         context = self.get_project_context()
-        hooks = self.load_hooks()
         
         # Handle tech_stack string properly
         backend_stack = context['tech_stack'].get('backend', '')
@@ -121,7 +261,35 @@ class ContextLoader:
         for principle in context['principles']:
             prompt_parts.append(f"- {principle}")
         
-        current_tokens = estimate_tokens('\n'.join(prompt_parts))
+        base_prompt = '\n'.join(prompt_parts)
+        base_chars = len(base_prompt) + 1
+        self._base_prompt_cache = (self._hooks_mtime, base_prompt, base_chars)
+        return base_prompt, base_chars
+    
+    def build_prompt_context(self, task: str, feature_type: str = None) -> str:
+        """Build optimized prompt context for a task with credit-saving practices."""
+        # Check cache first
+        cache_key = f"{feature_type}:{task}"
+        if self.credit_config.get("cache_context") and cache_key in self.context_cache:
+            return self.context_cache[cache_key]
+        
+        hooks = self.load_hooks()
+        
+        # Project header depends only on hooks.json, so it is reused across tasks
+        base_prompt, base_chars = self._get_base_prompt()
+        buf = io.StringIO()
+        buf.write(base_prompt)
+        
+        # Running character count so token accounting never re-scans the buffer
+        current_chars = base_chars
+        
+        def append(part: str) -> None:
+            nonlocal current_chars
+            buf.write('\n')
+            buf.write(part)
+            current_chars += len(part) + 1
+        
+        current_tokens = tokens_from_chars(current_chars)
         max_tokens = self.credit_config.get("max_tokens_per_context", 8000)
         
         if feature_type and feature_type in hooks.get("hooks", {}):
@@ -131,63 +299,60 @@ class ContextLoader:
                 max_tokens = min(max_tokens, hook_max_tokens)
             
             # Load prompt file if specified (preferred over inline template)
+            prompt_file_exists = False
             if "prompt_file" in hook_config:
                 prompt_file_path = self.project_root / hook_config["prompt_file"]
-                if prompt_file_path.exists():
+                prompt_file_exists = prompt_file_path.exists()
+                if prompt_file_exists:
                     prompt_content = load_file_with_limits(
                         prompt_file_path,
                         max_size_kb=self.credit_config.get("max_file_size_kb", 100)
                     )
                     if estimate_tokens(prompt_content) + current_tokens < max_tokens:
-                        prompt_parts.append("")
-                        prompt_parts.append("=" * 60)
-                        prompt_parts.append("PROMPT TEMPLATE:")
-                        prompt_parts.append("=" * 60)
-                        prompt_parts.append(prompt_content)
-                        prompt_parts.append("=" * 60)
-                        current_tokens = estimate_tokens('\n'.join(prompt_parts))
+                        append("")
+                        append("=" * 60)
+                        append("PROMPT TEMPLATE:")
+                        append("=" * 60)
+                        append(prompt_content)
+                        append("=" * 60)
+                        current_tokens = tokens_from_chars(current_chars)
             
             # Fallback to inline template if no prompt_file or if prompt_file wasn't loaded
-            if "template" in hook_config and ("prompt_file" not in hook_config or 
-                                               not (self.project_root / hook_config["prompt_file"]).exists()):
+            if "template" in hook_config and not prompt_file_exists:
                 template = hook_config["template"]
                 if estimate_tokens(template) + current_tokens < max_tokens:
-                    prompt_parts.append("")
-                    prompt_parts.append("Template:")
-                    prompt_parts.append(template)
-                    current_tokens = estimate_tokens('\n'.join(prompt_parts))
+                    append("")
+                    append("Template:")
+                    append(template)
+                    current_tokens = tokens_from_chars(current_chars)
             
             # Load example files with limits
             if "example_files" in hook_config:
-                prompt_parts.append("")
-                prompt_parts.append("Reference Examples:")
+                append("")
+                append("Reference Examples:")
                 for file_spec in hook_config["example_files"]:
-                    if current_tokens >= max_tokens * 0.9:  # Stop at 90% of limit
-                        prompt_parts.append("[Additional files skipped due to token limit]")
-                        break
-                    
-                    if isinstance(file_spec, dict):
-                        file_path = file_spec.get("path", "")
-                    else:
-                        file_path = file_spec
+                    file_path = file_spec.get("path", "")
                     
-                    prompt_parts.append(f"- {file_path}")
+                    # Check the cost before appending; stop at 90% of limit
+                    file_line = f"- {file_path}"
+                    if tokens_from_chars(current_chars + len(file_line) + 1) >= max_tokens * 0.9:
+                        append("[Additional files skipped due to token limit]")
+                        break
+                    append(file_line)
                     
-                    # Optionally include file content preview
-                    if self.credit_config.get("selective_loading"):
-                        file_content = self.load_file_content(file_spec)
-                        if file_content and not file_content.startswith("[File too large"):
-                            content_preview = file_content[:500]  # First 500 chars
-                            if len(file_content) > 500:
-                                content_preview += "\n[... truncated ...]"
-                            if estimate_tokens(content_preview) + current_tokens < max_tokens:
-                                prompt_parts.append(f"  Preview:\n{content_preview}")
-                                current_tokens = estimate_tokens('\n'.join(prompt_parts))
+                    # Optionally include file content preview (skip the read if nothing can fit)
+                    if (self.credit_config.get("selective_loading")
+                            and tokens_from_chars(current_chars + len(PREVIEW_HEADER) + 2) < max_tokens):
+                        content_preview = self.load_file_preview(file_spec)
+                        if content_preview:
+                            preview_entry = PREVIEW_HEADER + content_preview
+                            if tokens_from_chars(current_chars + len(preview_entry) + 1) < max_tokens:
+                                append(preview_entry)
         
-        prompt_parts.append("")
-        prompt_parts.append(f"Task: {task}")
+        append("")
+        append(f"Task: {task}")
         
-        result = "\n".join(prompt_parts)
+        result = buf.getvalue()
         
         # Cache result if caching enabled
         if self.credit_config.get("cache_context"):
@@ -196,9 +361,28 @@ class ContextLoader:
         return result
 
 
+def print_project_context(loader: ContextLoader, limit: int = None) -> None:
+    """Write the project context to stdout as indented JSON."""
+    context = loader.get_project_context()
+    if orjson is not None:
+        output = orjson.dumps(context, option=orjson.OPT_INDENT_2)
+    else:
+        output = json.dumps(context, indent=2).encode('utf-8')
+    
+    if limit:
+        output = b'\n'.join(output.split(b'\n')[:limit])
+    
+    sys.stdout.flush()
+    sys.stdout.buffer.write(output + b'\n')
+
+
 def main():
     """CLI interface for context loading."""
-    import sys
+    # Default (no arguments): skip argparse import and parser construction
+    if len(sys.argv) == 1:
+        print_project_context(ContextLoader())
+        return
+    
     import argparse
     
     parser = argparse.ArgumentParser(description="Load project context for Claude Code")
@@ -218,23 +402,23 @@ def main():
     if args.example:
         hooks = loader.load_hooks()
         hook_config = hooks.get('hooks', {}).get(args.example, {})
+        # Collect output and write it once instead of one print() per line
+        out = []
         if hook_config:
-            print(f"Hook: {args.example}")
-            print(f"\nTemplate:\n{hook_config.get('template', 'N/A')}")
-            print(f"\nExample Files:")
+            out.append(f"Hook: {args.example}")
+            out.append(f"\nTemplate:\n{hook_config.get('template', 'N/A')}")
+            out.append("\nExample Files:")
             for file_spec in hook_config.get('example_files', []):
-                if isinstance(file_spec, dict):
-                    file_path = file_spec.get("path", "")
-                    lines = file_spec.get("lines", "")
-                    max_size = file_spec.get("max_size_kb", "")
-                    print(f"  - {file_path}" + (f" (lines: {lines}, max: {max_size}KB)" if lines or max_size else ""))
-                else:
-                    print(f"  - {file_spec}")
+                file_path = file_spec.get("path", "")
+                lines = file_spec.get("lines", "")
+                max_size = file_spec.get("max_size_kb", "")
+                out.append(f"  - {file_path}" + (f" (lines: {lines}, max: {max_size}KB)" if lines or max_size else ""))
             if hook_config.get("max_context_tokens"):
-                print(f"\nMax Context Tokens: {hook_config.get('max_context_tokens')}")
+                out.append(f"\nMax Context Tokens: {hook_config.get('max_context_tokens')}")
         else:
-            print(f"Hook '{args.example}' not found")
-            print(f"Available hooks: {', '.join(hooks.get('hooks', {}).keys())}")
+            out.append(f"Hook '{args.example}' not found")
+            out.append(f"Available hooks: {', '.join(hooks.get('hooks', {}).keys())}")
+        sys.stdout.write('\n'.join(out) + '\n')
         return
     
     # Handle --hook or task
@@ -254,14 +438,7 @@ def main():
             print(context)
     else:
         # Default: show project context as JSON
-        context = loader.get_project_context()
-        output = json.dumps(context, indent=2)
-        
-        if args.limit:
-            lines = output.split('\n')[:args.limit]
-            output = '\n'.join(lines)
-        
-        print(output)
+        print_project_context(loader, args.limit)
 
 
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ Helps LLC owners translate their AI work into job market terms.
 Human-in-the-Loop: AI suggests language, humans refine.
 """
 import logging
+import re
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 from sqlalchemy.orm import Session
@@ -15,6 +16,9 @@ from resilience.state_management import StateManager, CheckpointType
 
 logger = logging.getLogger(__name__)
 
+# Action verbs the fallback looks for (substring match) before prefixing one
+ACTION_VERB_PATTERN = re.compile("built|created|developed|implemented")
+
 
 class ArticulationAssistant:
     """Assists users in articulating their AI capabilities."""
@@ -60,11 +64,10 @@ class ArticulationAssistant:
         )
         
         self.db.add(suggestion)
-        self.db.commit()
-        self.db.refresh(suggestion)
+        self.db.flush()
         
-        # Create checkpoint
-        checkpoint = self.state_manager.create_checkpoint(
+        # Create checkpoint (committed with the suggestion)
+        checkpoint = self.state_manager.stage_checkpoint(
             checkpoint_type=CheckpointType.ARTICULATION,
             entity_id=str(suggestion.id),
             state_data={
@@ -133,8 +136,9 @@ class ArticulationAssistant:
         # Simple improvements
         text = original_text
         # Add action verbs if missing
-        if not any(word in text.lower() for word in ["built", "created", "developed", "implemented"]):
-            text = f"Developed {text.lower()}"
+        lowered = text.lower()
+        if not ACTION_VERB_PATTERN.search(lowered):
+            text = f"Developed {lowered}"
         return text
     
     def human_refine_suggestion(
@@ -143,9 +147,7 @@ class ArticulationAssistant:
         refined_text: str
     ) -> ArticulationSuggestion:
         """Human refines AI suggestion."""
-        suggestion = self.db.query(ArticulationSuggestion).filter(
-            ArticulationSuggestion.id == suggestion_id
-        ).first()
+        suggestion = self.db.get(ArticulationSuggestion, suggestion_id)
         
         if not suggestion:
             raise ValueError(f"Suggestion {suggestion_id} not found")
@@ -160,11 +162,10 @@ class ArticulationAssistant:
         )
         
         self.db.add(new_suggestion)
-        self.db.commit()
-        self.db.refresh(new_suggestion)
+        self.db.flush()
         
-        # Create checkpoint
-        checkpoint = self.state_manager.create_checkpoint(
+        # Create checkpoint (committed with the suggestion)
+        checkpoint = self.state_manager.stage_checkpoint(
             checkpoint_type=CheckpointType.ARTICULATION,
             entity_id=str(new_suggestion.id),
             state_data={
@@ -185,9 +186,7 @@ class ArticulationAssistant:
     
     def get_suggestion(self, suggestion_id: int) -> Optional[ArticulationSuggestion]:
         """Get suggestion by ID."""
-        return self.db.query(ArticulationSuggestion).filter(
-            ArticulationSuggestion.id == suggestion_id
-        ).first()
+        return self.db.get(ArticulationSuggestion, suggestion_id)
     
     def list_user_suggestions(self, user_id: str) -> List[ArticulationSuggestion]:
         """List all suggestions for a user."""
@@ -3,6 +3,7 @@ Bias Detection System.
 Human-in-the-Loop: AI detects, humans review flagged content.
 """
 import logging
+import re
 from typing import Dict, Any, List
 from sqlalchemy.orm import Session
 
@@ -11,6 +12,11 @@ from config import settings
 
 logger = logging.getLogger(__name__)
 
+# Fallback keywords, matched as substrings in one pass over the lowercased content
+CREDENTIALISM_PATTERN = re.compile("|".join(map(re.escape, [
+    "degree required", "phd", "masters required"
+])))
+
 
 class BiasDetector:
     """Detects bias in content."""
@@ -82,8 +88,7 @@ class BiasDetector:
     
     def _fallback_bias_analysis(self, content: str) -> Dict[str, Any]:
         """Fallback bias analysis."""
-        credentialism_keywords = ["degree required", "phd", "masters required"]
-        credentialism = any(kw in content.lower() for kw in credentialism_keywords)
+        credentialism = CREDENTIALISM_PATTERN.search(content.lower()) is not None
         
         return {
             "bias_detected": credentialism,
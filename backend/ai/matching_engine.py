@@ -3,9 +3,9 @@ AI-Powered Matching Engine.
 Human-in-the-Loop Architecture: AI generates initial matches, human reviewers validate.
 """
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, FrozenSet, Optional
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, raiseload
 
 from openai import OpenAI
 from config import settings
@@ -51,9 +51,7 @@ class MatchingEngine:
             raise ValueError("User has no capability assessment")
         
         # Get user's profile
-        user = self.db.query(AnonymousUser).filter(
-            AnonymousUser.id == user_id
-        ).first()
+        user = self.db.get(AnonymousUser, user_id)
         
         if not user:
             raise ValueError("User not found")
@@ -75,32 +73,36 @@ class MatchingEngine:
                 match_reasons=match_data["reasons"],
                 human_reviewed=False
             )
-            self.db.add(match)
             matches.append(match)
         
-        self.db.commit()
+        # Insert the matches and their checkpoints in one transaction; the flush
+        # assigns match ids without a commit per row
+        self.db.add_all(matches)
+        self.db.flush()
         
-        # Create checkpoints for each match
-        for match in matches:
-            checkpoint = self.state_manager.create_checkpoint(
-                checkpoint_type=CheckpointType.MATCHING,
-                entity_id=str(match.id),
-                state_data={
+        checkpoints = self.state_manager.create_checkpoints(
+            CheckpointType.MATCHING,
+            [
+                (str(match.id), {
                     "match_id": match.id,
                     "user_id": match.user_id,
                     "job_posting_id": match.job_posting_id,
                     "match_score": match.match_score,
                     "match_reasons": match.match_reasons,
                     "created_at": match.created_at.isoformat()
-                }
-            )
+                })
+                for match in matches
+            ]
+        )
+        for match, checkpoint in zip(matches, checkpoints):
             match.checkpoint_id = checkpoint.id
         
+        match_ids = [match.id for match in matches]
         self.db.commit()
         
-        # Refresh matches
-        for match in matches:
-            self.db.refresh(match)
+        # Reload the committed (expired) matches with one query instead of a refresh per row
+        if match_ids:
+            self.db.query(Match).filter(Match.id.in_(match_ids)).all()
         
         # Flag for human review if needed
         high_value_matches = [m for m in matches if m.match_score >= 80]
@@ -136,11 +138,10 @@ class MatchingEngine:
         
         matches = []
         
-        # Build user profile for longevity prediction
-        user = self.db.query(AnonymousUser).filter(
-            AnonymousUser.id == user_id
-        ).first()
+        # The user's side of every comparison below; built once instead of per candidate job
+        user_skill_set = frozenset(user_skills)
         
+        # Build user profile for longevity prediction
         user_profile = {
             "skills": user_skills,
             "learning_goals": assessment.results.get("learning_goals", []),
@@ -153,7 +154,7 @@ class MatchingEngine:
         for job in job_postings:
             # Calculate compatibility score (immediate skill fit)
             compatibility_score = self._calculate_match_score(
-                user_skills=user_skills,
+                user_skills=user_skill_set,
                 user_proficiency=proficiency_score,
                 job_requirements=job.required_skills,
                 job_preferred=job.preferred_skills or []
@@ -189,7 +190,7 @@ class MatchingEngine:
                     "predicted_months": longevity_prediction["predicted_months"],
                     "longevity_factors": longevity_prediction["factors"],
                     "reasons": self._generate_match_reasons(
-                        user_skills, job.required_skills, compatibility_score
+                        user_skill_set, job.required_skills, compatibility_score
                     ) + longevity_prediction["factors"]
                 })
         
@@ -199,7 +200,7 @@ class MatchingEngine:
     
     def _calculate_match_score(
         self,
-        user_skills: List[str],
+        user_skills: FrozenSet[str],
         user_proficiency: int,
         job_requirements: List[str],
         job_preferred: List[str]
@@ -209,7 +210,7 @@ class MatchingEngine:
         score = user_proficiency * 0.4
         
         # Required skills match
-        required_match = len(set(user_skills) & set(job_requirements))
+        required_match = len(user_skills.intersection(job_requirements))
         if job_requirements:
             required_score = (required_match / len(job_requirements)) * 40
             score += required_score
@@ -217,7 +218,7 @@ class MatchingEngine:
             score += 20
         
         # Preferred skills bonus
-        preferred_match = len(set(user_skills) & set(job_preferred))
+        preferred_match = len(user_skills.intersection(job_preferred))
         if job_preferred:
             preferred_score = (preferred_match / len(job_preferred)) * 20
             score += preferred_score
@@ -226,14 +227,14 @@ class MatchingEngine:
     
     def _generate_match_reasons(
         self,
-        user_skills: List[str],
+        user_skills: FrozenSet[str],
         job_requirements: List[str],
         score: int
     ) -> List[str]:
         """Generate reasons for the match."""
         reasons = []
         
-        matching_skills = set(user_skills) & set(job_requirements)
+        matching_skills = user_skills.intersection(job_requirements)
         if matching_skills:
             reasons.append(f"Strong match on: {', '.join(list(matching_skills)[:3])}")
         
@@ -252,7 +253,7 @@ class MatchingEngine:
         feedback: Optional[str] = None
     ) -> Match:
         """Human reviewer validates/refines match."""
-        match = self.db.query(Match).filter(Match.id == match_id).first()
+        match = self.db.get(Match, match_id)
         
         if not match:
             raise ValueError(f"Match {match_id} not found")
@@ -271,10 +272,8 @@ class MatchingEngine:
             # Keep score but flag for refinement
             match.match_reasons = (match.match_reasons or []) + ["Needs refinement"]
         
-        self.db.commit()
-        
-        # Create checkpoint after human review
-        checkpoint = self.state_manager.create_checkpoint(
+        # Create checkpoint after human review (committed with the review)
+        checkpoint = self.state_manager.stage_checkpoint(
             checkpoint_type=CheckpointType.MATCHING,
             entity_id=str(match.id),
             state_data={
@@ -292,21 +291,25 @@ class MatchingEngine:
         
         match.checkpoint_id = checkpoint.id
         self.db.commit()
-        self.db.refresh(match)
         
+        # No refresh: the commit expires the match, so it is reloaded only if the caller reads it
         return match
     
     def get_match(self, match_id: int) -> Optional[Match]:
         """Get match by ID."""
-        return self.db.query(Match).filter(Match.id == match_id).first()
+        return self.db.get(Match, match_id)
     
     def list_user_matches(
         self,
         user_id: str,
         limit: int = 20
     ) -> List[Match]:
-        """List matches for a user."""
-        return self.db.query(Match).filter(
+        """
+        List matches for a user.
+        Responses only use Match columns, so relationship lazy loads are
+        disabled to stop a per-row query (N+1) creeping in unnoticed.
+        """
+        return self.db.query(Match).options(raiseload("*")).filter(
             Match.user_id == user_id
         ).order_by(Match.match_score.desc()).limit(limit).all()
 
@@ -3,6 +3,7 @@ AI Moderation & Facilitation.
 Human-in-the-Loop: AI flags, humans make final decisions.
 """
 import logging
+import re
 from typing import Dict, Any, Optional, List
 from sqlalchemy.orm import Session
 
@@ -13,6 +14,11 @@ from resilience.state_management import StateManager, CheckpointType
 
 logger = logging.getLogger(__name__)
 
+# Fallback keywords, matched as substrings in one pass over the lowercased content
+FLAGGED_PATTERN = re.compile("|".join(map(re.escape, [
+    "degree required", "must have phd", "ivy league"
+])))
+
 
 class ModerationEngine:
     """AI moderation with human oversight."""
@@ -90,8 +96,7 @@ class ModerationEngine:
     
     def _fallback_analysis(self, content: str) -> Dict[str, Any]:
         """Fallback analysis when AI unavailable."""
-        flagged_keywords = ["degree required", "must have phd", "ivy league"]
-        flagged = any(keyword in content.lower() for keyword in flagged_keywords)
+        flagged = FLAGGED_PATTERN.search(content.lower()) is not None
         
         return {
             "flagged": flagged,
@@ -30,7 +30,7 @@ async def get_user_info(
     db: Session = Depends(get_db)
 ):
     """Get user information including preferred language and login provider."""
-    user = db.query(AnonymousUser).filter(AnonymousUser.id == anonymous_id).first()
+    user = db.get(AnonymousUser, anonymous_id)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -93,7 +93,7 @@ async def get_session(
         raise HTTPException(status_code=401, detail="No active session")
     
     # Get user info
-    user = db.query(AnonymousUser).filter(AnonymousUser.id == anonymous_id).first()
+    user = db.get(AnonymousUser, anonymous_id)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
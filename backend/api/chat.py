@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Dict, Optional
+import asyncio
 import logging
 
 from database.connection import get_db
@@ -69,7 +70,8 @@ async def chat(
         messages = [{"role": m.role, "content": m.content} for m in request.messages]
         
         # Get response from LLM
-        response = llm.chat(
+        response = await asyncio.to_thread(
+            llm.chat,
             messages=messages,
             temperature=request.temperature,
             max_tokens=request.max_tokens
@@ -127,6 +129,30 @@ async def chat_status():
         }
 
 
+# Static instructions for the job match chat. The per-user profile is appended
+# after them, so every request shares this prefix and providers (and Ollama's
+# KV cache) can reuse it instead of re-processing the whole prompt.
+JOB_MATCH_SYSTEM_PROMPT = """You are a specialized job matching assistant for JobMatch. Your ONLY purpose is to help users find job opportunities that match their skills and preferences.
+
+Your responsibilities:
+1. Help users articulate what kind of roles they're looking for
+2. Suggest job types, industries, or companies that match their profile
+3. Ask clarifying questions to better understand their needs
+4. Provide insights about job market trends relevant to their search
+
+IMPORTANT RESTRICTIONS:
+- DO NOT offer interview preparation advice
+- DO NOT write or review resumes
+- DO NOT provide career coaching beyond job matching
+- Keep responses focused, helpful, and conversational
+- If asked about non-job-matching topics, politely redirect to job search
+
+Your goal is to help users discover opportunities they might not have considered and match them with roles where they can succeed.
+
+User Profile:
+"""
+
+
 class JobMatchChatRequest(BaseModel):
     """Job match chat request model."""
     message: str
@@ -185,27 +211,12 @@ async def job_match_chat(
         location = request.context.get("location", "not specified")
         preferences = request.context.get("preferences", "not specified")
         
-        system_prompt = f"""You are a specialized job matching assistant for JobMatch. Your ONLY purpose is to help users find job opportunities that match their skills and preferences.
-
-User Profile:
-- Skills: {skills_str}
-- Location: {location}
-- Preferences: {preferences}
-
-Your responsibilities:
-1. Help users articulate what kind of roles they're looking for
-2. Suggest job types, industries, or companies that match their profile
-3. Ask clarifying questions to better understand their needs
-4. Provide insights about job market trends relevant to their search
-
-IMPORTANT RESTRICTIONS:
-- DO NOT offer interview preparation advice
-- DO NOT write or review resumes
-- DO NOT provide career coaching beyond job matching
-- Keep responses focused, helpful, and conversational
-- If asked about non-job-matching topics, politely redirect to job search
-
-Your goal is to help users discover opportunities they might not have considered and match them with roles where they can succeed."""
+        system_prompt = (
+            f"{JOB_MATCH_SYSTEM_PROMPT}"
+            f"- Skills: {skills_str}\n"
+            f"- Location: {location}\n"
+            f"- Preferences: {preferences}"
+        )
         
         # Build message history
         messages = [{"role": "system", "content": system_prompt}]
@@ -226,7 +237,8 @@ Your goal is to help users discover opportunities they might not have considered
         })
         
         # Get response from LLM
-        response = llm.chat(
+        response = await asyncio.to_thread(
+            llm.chat,
             messages=messages,
             temperature=0.7,
             max_tokens=500
@@ -274,7 +286,8 @@ async def test_chat():
             }
         ]
         
-        response = llm.chat(
+        response = await asyncio.to_thread(
+            llm.chat,
             messages=test_messages,
             temperature=0.7,
             max_tokens=50
@@ -6,7 +6,6 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import secrets
-import hashlib
 from datetime import datetime
 
 from database.connection import get_db
@@ -48,9 +47,7 @@ class ConversationResponse(BaseModel):
 
 def generate_session_id() -> str:
     """Generate a unique session ID."""
-    random_bytes = secrets.token_bytes(32)
-    session_id = hashlib.sha256(random_bytes).hexdigest()
-    return session_id
+    return secrets.token_hex(32)
 
 
 @router.post("/save", response_model=ConversationResponse)
@@ -0,0 +1,270 @@
+"""
+Email bodies for subscription notifications (receipts, payment failures,
+credit requests).
+
+Static markup is compiled once at import so each send only substitutes the
+dynamic fragments. Values interpolated into HTML are escaped since some of
+them (credit request reason, email) come straight from user input.
+"""
+from datetime import datetime
+from functools import lru_cache
+from html import escape
+from string import Template
+from typing import Optional, TYPE_CHECKING
+
+from database.models import CreditRequest
+
+if TYPE_CHECKING:
+    from .subscription import CreditRequestIn
+
+
+# Shared HTML email layout. Each email supplies its title, header colours,
+# extra styles, body and footer; the per-email templates are assembled from it
+# once at import and then only substitute the dynamic fields on send.
+_EMAIL_HTML_LAYOUT = Template("""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>${title} - JobMatch.zip</title>
+        <style>
+            body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; }
+            .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+            .header { background: linear-gradient(135deg, ${header_gradient}); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
+            .content { background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }
+${styles}
+            .footer { text-align: center; margin-top: 20px; color: #666; font-size: 14px; }
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>${heading}</h1>
+                <p>${subheading}</p>
+            </div>
+            <div class="content">
+${content}
+            </div>
+            <div class="footer">
+${footer}
+            </div>
+        </div>
+    </body>
+    </html>
+    """)
+
+_AUTOMATED_FOOTER = """\
+                <p>JobMatch.zip - Making job matching smarter</p>
+                <p>This is an automated message, please do not reply.</p>"""
+
+
+def _email_html_template(**parts: str) -> Template:
+    """Fill the shared layout with one email's static parts and compile the result."""
+    # Substituted values are not re-parsed, so the parts' own $placeholders
+    # survive into the returned template
+    return Template(_EMAIL_HTML_LAYOUT.substitute(**parts))
+
+
+_RECEIPT_HTML_TMPL = _email_html_template(
+    title="Payment Receipt",
+    header_gradient="#667eea 0%, #764ba2 100%",
+    styles="""\
+            .amount { font-size: 48px; font-weight: bold; color: #28a745; text-align: center; margin: 20px 0; }""",
+    heading="✅ Payment Received",
+    subheading="Thank you for your subscription!",
+    content="""\
+                <div class="amount">$$${amount}</div>
+                <p style="text-align: center; font-size: 18px;">Your payment has been successfully processed.</p>
+                ${period_end}
+                ${invoice_link}
+                <p style="margin-top: 30px;">Thank you for being a JobMatch.zip subscriber!</p>""",
+    footer=_AUTOMATED_FOOTER,
+)
+
+
+_RECEIPT_TEXT_TMPL = Template("""
+Payment Receipt - JobMatch.zip
+
+✅ Payment Received
+
+Amount: $$${amount}
+
+Your payment has been successfully processed.
+${period_end}${invoice_text}
+Thank you for being a JobMatch.zip subscriber!
+
+---
+JobMatch.zip - Making job matching smarter
+This is an automated message, please do not reply.
+    """)
+
+
+_PAYMENT_FAILED_HTML_TMPL = _email_html_template(
+    title="Payment Failed",
+    header_gradient="#dc3545 0%, #c82333 100%",
+    styles="""\
+            .amount { font-size: 36px; font-weight: bold; color: #dc3545; text-align: center; margin: 20px 0; }
+            .warning-box { background: #fff3cd; border-left: 4px solid #ffc107; padding: 15px; margin: 20px 0; }""",
+    heading="⚠️ Payment Failed",
+    subheading="Action Required",
+    content="""\
+                <div class="amount">$$${amount}</div>
+                <p style="text-align: center; font-size: 18px;">We were unable to process your payment.</p>
+                ${attempt_text}
+                <div class="warning-box">
+                    <p><strong>What to do:</strong></p>
+                    <ol>
+                        <li>Update your payment method</li>
+                        <li>Ensure sufficient funds are available</li>
+                        <li>Contact your bank if the issue persists</li>
+                    </ol>
+                </div>
+                ${invoice_link}
+                <p style="margin-top: 30px;">Your subscription will remain active for a few more days. Please update your payment method to avoid service interruption.</p>""",
+    footer=_AUTOMATED_FOOTER,
+)
+
+
+_PAYMENT_FAILED_TEXT_TMPL = Template("""
+Payment Failed - JobMatch.zip
+
+⚠️ Payment Failed - Action Required
+
+Amount: $$${amount}
+
+${attempt_text}We were unable to process your payment.
+
+What to do:
+1. Update your payment method
+2. Ensure sufficient funds are available
+3. Contact your bank if the issue persists
+${invoice_text}
+Your subscription will remain active for a few more days. Please update your payment method to avoid service interruption.
+
+---
+JobMatch.zip - Making job matching smarter
+This is an automated message, please do not reply.
+    """)
+
+
+_CREDIT_REQUEST_HTML_TMPL = _email_html_template(
+    title="Credit Request",
+    header_gradient="#667eea 0%, #764ba2 100%",
+    styles="""\
+            .info-box { background: #e7f3ff; border-left: 4px solid #667eea; padding: 15px; margin: 20px 0; }""",
+    heading="💳 Credit Request",
+    subheading="New Request Received",
+    content="""\
+                <div class="info-box">
+                    <p><strong>Request ID:</strong> ${request_id}</p>
+                    <p><strong>Subscription ID:</strong> ${subscription_id}</p>
+                    <p><strong>Customer Email:</strong> ${email}</p>
+                    <p><strong>Days Since Start:</strong> ${days_since_start}</p>
+                    <p><strong>Status:</strong> ${status}</p>
+                </div>
+                <h3>Reason:</h3>
+                <p style="background: white; padding: 15px; border-radius: 5px;">${reason}</p>
+                <p style="margin-top: 30px;"><strong>Action Required:</strong> Review and respond within 2 business days.</p>""",
+    footer="""\
+                <p>JobMatch.zip Support Team</p>""",
+)
+
+
+_CREDIT_REQUEST_TEXT_TMPL = Template("""
+Credit Request - JobMatch.zip
+
+💳 New Credit Request Received
+
+Request ID: ${request_id}
+Subscription ID: ${subscription_id}
+Customer Email: ${email}
+Days Since Start: ${days_since_start}
+Status: ${status}
+
+Reason:
+${reason}
+
+Action Required: Review and respond within 2 business days.
+
+---
+JobMatch.zip Support Team
+    """)
+
+
+# Email template functions
+@lru_cache(maxsize=256)
+def _format_billing_date(current_period_end: str) -> str:
+    """Format an ISO period end as the 'Month DD, YYYY' shown in receipts."""
+    end_date = datetime.fromisoformat(current_period_end.replace('Z', '+00:00'))
+    return end_date.strftime('%B %d, %Y')
+
+
+def _next_billing_date(subscription_info: Optional[dict]) -> str:
+    """Next billing date for a receipt, or "" when unknown or unparseable."""
+    if not subscription_info or not subscription_info.get("current_period_end"):
+        return ""
+    try:
+        return _format_billing_date(subscription_info["current_period_end"])
+    except (AttributeError, TypeError, ValueError):
+        return ""
+
+
+def generate_receipt_email_html(amount: float, invoice_url: str = "", subscription_info: Optional[dict] = None) -> str:
+    """Generate HTML receipt email."""
+    billing_date = _next_billing_date(subscription_info)
+    period_end = f"<p><strong>Next billing date:</strong> {billing_date}</p>" if billing_date else ""
+    
+    invoice_link = f'<p><a href="{escape(invoice_url)}" style="color: #667eea; text-decoration: none;">View Invoice</a></p>' if invoice_url else ""
+    
+    return _RECEIPT_HTML_TMPL.substitute(amount=f"{amount:.2f}", period_end=period_end, invoice_link=invoice_link)
+
+
+def generate_receipt_email_text(amount: float, invoice_url: str = "", subscription_info: Optional[dict] = None) -> str:
+    """Generate plain text receipt email."""
+    billing_date = _next_billing_date(subscription_info)
+    period_end = f"\nNext billing date: {billing_date}\n" if billing_date else ""
+    
+    invoice_text = f"\nView invoice: {invoice_url}\n" if invoice_url else ""
+    
+    return _RECEIPT_TEXT_TMPL.substitute(amount=f"{amount:.2f}", period_end=period_end, invoice_text=invoice_text)
+
+
+def generate_payment_failed_email_html(amount: float, invoice_url: str = "", attempt_count: int = 1) -> str:
+    """Generate HTML payment failure email."""
+    invoice_link = f'<p><a href="{escape(invoice_url)}" style="display: inline-block; background: #dc3545; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; margin: 20px 0;">Update Payment Method</a></p>' if invoice_url else ""
+    attempt_text = f"<p><strong>Attempt #{attempt_count}</strong> - " if attempt_count > 1 else ""
+    
+    return _PAYMENT_FAILED_HTML_TMPL.substitute(amount=f"{amount:.2f}", attempt_text=attempt_text, invoice_link=invoice_link)
+
+
+def generate_payment_failed_email_text(amount: float, invoice_url: str = "", attempt_count: int = 1) -> str:
+    """Generate plain text payment failure email."""
+    attempt_text = f"Attempt #{attempt_count} - " if attempt_count > 1 else ""
+    invoice_text = f"\nUpdate payment method: {invoice_url}\n" if invoice_url else ""
+    
+    return _PAYMENT_FAILED_TEXT_TMPL.substitute(amount=f"{amount:.2f}", attempt_text=attempt_text, invoice_text=invoice_text)
+
+
+def generate_credit_request_email_html(credit_request: CreditRequest, request: "CreditRequestIn") -> str:
+    """Generate HTML credit request notification email for support team."""
+    return _CREDIT_REQUEST_HTML_TMPL.substitute(
+        request_id=credit_request.id,
+        subscription_id=escape(request.subscription_id),
+        email=escape(request.email),
+        days_since_start=credit_request.days_since_start,
+        status=credit_request.status,
+        reason=escape(request.reason),
+    )
+
+
+def generate_credit_request_email_text(credit_request: CreditRequest, request: "CreditRequestIn") -> str:
+    """Generate plain text credit request notification email for support team."""
+    return _CREDIT_REQUEST_TEXT_TMPL.substitute(
+        request_id=credit_request.id,
+        subscription_id=request.subscription_id,
+        email=request.email,
+        days_since_start=credit_request.days_since_start,
+        status=credit_request.status,
+        reason=request.reason,
+    )
@@ -46,11 +46,12 @@ async def create_post(
         parent_post_id=request.parent_post_id
     )
     
+    # Flush assigns id and created_at; build the response before the commit
+    # expires the post, so no refresh SELECT is needed
     db.add(post)
-    db.commit()
-    db.refresh(post)
+    db.flush()
     
-    return ForumPostResponse(
+    response = ForumPostResponse(
         id=post.id,
         user_id=post.user_id,
         forum_topic=post.forum_topic,
@@ -59,6 +60,9 @@ async def create_post(
         parent_post_id=post.parent_post_id,
         created_at=post.created_at.isoformat()
     )
+    db.commit()
+    
+    return response
 
 
 @router.get("/posts/{post_id}", response_model=ForumPostResponse)
@@ -67,7 +71,7 @@ async def get_post(
     db: Session = Depends(get_db)
 ):
     """Get forum post by ID."""
-    post = db.query(ForumPost).filter(ForumPost.id == post_id).first()
+    post = db.get(ForumPost, post_id)
     
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -222,7 +222,7 @@ async def google_auth_status(
     if not anonymous_id:
         return {"linked": False, "provider": None}
     
-    user = db.query(AnonymousUser).filter(AnonymousUser.id == anonymous_id).first()
+    user = db.get(AnonymousUser, anonymous_id)
     if not user:
         return {"linked": False, "provider": None}
     
@@ -135,17 +135,18 @@ async def review_match(
     engine = create_matching_engine(db)
     
     try:
-        match = engine.human_review_match(
+        engine.human_review_match(
             match_id=match_id,
             reviewer_id=request.reviewer_id,
             decision=request.decision,
             feedback=request.feedback
         )
         
+        # Built from the request rather than the committed match, which would reload it
         return {
-            "match_id": match.id,
-            "human_reviewed": match.human_reviewed,
-            "reviewer_id": match.human_reviewer_id,
+            "match_id": match_id,
+            "human_reviewed": True,
+            "reviewer_id": request.reviewer_id,
             "decision": request.decision,
             "message": "Match reviewed successfully"
         }
@@ -106,7 +106,7 @@ async def authenticate_with_social(
         raise HTTPException(status_code=401, detail="Authentication failed")
     
     # Get preferred language from user
-    user = db.query(AnonymousUser).filter(AnonymousUser.id == anonymous_id).first()
+    user = db.get(AnonymousUser, anonymous_id)
     preferred_language = None
     if user and user.meta_data and "preferred_language" in user.meta_data:
         preferred_language = user.meta_data["preferred_language"]
@@ -3,45 +3,90 @@ Stripe subscription management API routes.
 Handles checkout sessions, webhooks, refunds, and subscription management.
 Works with anonymous_id to maintain zero-knowledge architecture.
 """
-from fastapi import APIRouter, HTTPException, Request, Header, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, Header, Depends
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Callable, Optional
+import asyncio
+import hashlib
+import json
+import logging
 import stripe
 import os
+import random
+import threading
+import time
 from datetime import datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from config import settings
 from database.connection import get_db
-from database.models import AnonymousUser, Subscription, CreditRequest
+from database.models import AnonymousUser, Subscription, CreditRequest, StripeEvent
 from auth.session_manager import create_session_manager
 from auth.email_provider import create_email_manager
+from infrastructure.scaling import scaling_manager
+from security.pii_redaction import redact_email
+
+from .email_templates import (
+    generate_receipt_email_html,
+    generate_receipt_email_text,
+    generate_payment_failed_email_html,
+    generate_payment_failed_email_text,
+    generate_credit_request_email_html,
+    generate_credit_request_email_text,
+)
 
 router = APIRouter(prefix="/api/subscription", tags=["subscription"])
+logger = logging.getLogger(__name__)
+
+# Stripe keys are validated once at startup by config.Settings (production
+# exits if they are missing); development falls back to a placeholder test key
+if not settings.STRIPE_SECRET_KEY:
+    logger.warning("STRIPE_SECRET_KEY not set; using placeholder test key")
+stripe.api_key = settings.STRIPE_SECRET_KEY or "sk_test_your-stripe-secret-key"
+
+# One explicit client for all Stripe calls; RequestsClient keeps a keep-alive
+# session per thread, so the asyncio.to_thread workers reuse TLS connections
+# without sharing a (non-thread-safe) requests.Session between them
+stripe.default_http_client = stripe.http_client.RequestsClient(verify_ssl_certs=True)
+
+
+# Client-side guard for Stripe's API rate limits: cap in-flight calls and
+# retry 429 responses with backoff (honouring Retry-After when present)
+STRIPE_MAX_CONCURRENCY = int(os.getenv("STRIPE_MAX_CONCURRENCY", "25"))
+STRIPE_MAX_ATTEMPTS = 5
+STRIPE_RETRY_INITIAL_DELAY = 0.5
+STRIPE_RETRY_MAX_DELAY = 8.0
+_stripe_semaphore = threading.BoundedSemaphore(STRIPE_MAX_CONCURRENCY)
+
+
+def stripe_call(fn: Callable, *args, **kwargs):
+    """Call a stripe-python function, retrying rate-limited (429) requests."""
+    delay = STRIPE_RETRY_INITIAL_DELAY
+    for attempt in range(1, STRIPE_MAX_ATTEMPTS + 1):
+        try:
+            with _stripe_semaphore:
+                return fn(*args, **kwargs)
+        except stripe.error.RateLimitError as e:
+            if attempt == STRIPE_MAX_ATTEMPTS:
+                raise
+            headers = e.headers or {}
+            retry_after = headers.get("Retry-After") or headers.get("retry-after")
+            try:
+                wait = float(retry_after)
+            except (TypeError, ValueError):
+                wait = delay + random.uniform(0, delay)
+            time.sleep(min(wait, STRIPE_RETRY_MAX_DELAY))
+            delay = min(delay * 2, STRIPE_RETRY_MAX_DELAY)
+
 
-# Initialize Stripe - reload from env on each module load
-import sys
-if 'stripe' in sys.modules:
-    import importlib
-    importlib.reload(stripe)
-
-# CRITICAL: Stripe secret key must be set via environment variable
-# No default value - fail fast if not configured
-stripe_secret_key = os.getenv("STRIPE_SECRET_KEY")
-if not stripe_secret_key:
-    import sys
-    print("\n" + "="*80, file=sys.stderr)
-    print("CRITICAL ERROR: STRIPE_SECRET_KEY environment variable not set!", file=sys.stderr)
-    print("="*80, file=sys.stderr)
-    print("\nFor production, set STRIPE_SECRET_KEY=sk_live_...", file=sys.stderr)
-    print("For testing, set STRIPE_SECRET_KEY=sk_test_...", file=sys.stderr)
-    print("="*80 + "\n", file=sys.stderr)
-    # In production, fail hard; in development, allow test key
-    if os.getenv("ENVIRONMENT", "development").lower() not in ["development", "dev", "test"]:
-        sys.exit(1)
-    stripe_secret_key = "sk_test_your-stripe-secret-key"  # Only for dev/test
-
-stripe.api_key = stripe_secret_key
+async def async_stripe_call(fn: Callable, *args, **kwargs):
+    """Run a blocking stripe-python call in a worker thread so the event loop stays free."""
+    return await asyncio.to_thread(stripe_call, fn, *args, **kwargs)
 
 # Pricing configuration - $1/month accessible tier
 MONTHLY_PRICE = 100  # $1.00 in cents
@@ -51,11 +96,36 @@ TRIAL_PERIOD_DAYS = 0  # No trial period
 MAX_RESUBSCRIPTIONS = 999  # Effectively unlimited
 REFUND_PERIOD_DAYS = 14
 CREDIT_PERIOD_DAYS = 60
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Subscription status cache: responses are served from Redis while fresh;
+# older copies are kept as a fallback when Stripe is unavailable
+STATUS_CACHE_FRESH_SECONDS = 10
+STATUS_CACHE_STALE_SECONDS = 3600
+
+# anonymous_id -> Stripe customer id, so repeat users skip Customer.list
+CUSTOMER_ID_CACHE_SECONDS = 24 * 60 * 60
+# email -> Stripe customer id (and the anonymous_id in its metadata)
+CUSTOMER_EMAIL_CACHE_SECONDS = 300
 
 # Stripe IDs ($1/month accessible tier)
 PRODUCT_ID = "prod_TTzej3xRNJiuWR"
 PRICE_ID = "price_1SX1fwPbrn8kzeBd7WDE08us"
 
+# Checkout session parameters that never change between requests
+CHECKOUT_SESSION_PARAMS = {
+    "payment_method_types": ["card"],
+    "line_items": [
+        {
+            "price": PRICE_ID,  # Use pre-configured price with trial
+            "quantity": 1,
+        }
+    ],
+    "mode": "subscription",
+    "success_url": f"{settings.FRONTEND_URL}/dashboard?subscription=success&session_id={{CHECKOUT_SESSION_ID}}",
+    "cancel_url": f"{settings.FRONTEND_URL}/",
+}
+
 
 # Pydantic models
 class CheckoutSessionRequest(BaseModel):
@@ -73,7 +143,7 @@ class RefundRequest(BaseModel):
     reason: Optional[str] = None
 
 
-class CreditRequest(BaseModel):
+class CreditRequestIn(BaseModel):
     subscription_id: str
     reason: str
     email: EmailStr
@@ -102,15 +172,7 @@ async def create_checkout_session(
         email = request.email
         if not email and anonymous_id:
             # Try to get email from anonymous user's linked accounts
-            user = db.query(AnonymousUser).filter(AnonymousUser.id == anonymous_id).first()
-            if user and user.meta_data:
-                # Check for email in social accounts or emails
-                if "emails" in user.meta_data and user.meta_data["emails"]:
-                    email = user.meta_data["emails"][0].get("address")
-                elif "social_accounts" in user.meta_data:
-                    # Try Google account first
-                    if "google" in user.meta_data["social_accounts"]:
-                        email = user.meta_data["social_accounts"]["google"].get("provider_data", {}).get("email")
+            email = get_primary_email(db, anonymous_id)
         
         if not email:
             raise HTTPException(
@@ -118,9 +180,19 @@ async def create_checkout_session(
                 detail="Email required. Please authenticate with Google or provide email."
             )
         
-        # Get or create customer
-        customer = await get_or_create_customer(email, anonymous_id or request.user_id)
-        subscription_count = await get_customer_subscription_count(customer.id)
+        # Get or create customer, reusing the cached customer id when the user
+        # checks out again with the same email
+        customer_id = get_cached_customer_id(anonymous_id, email) if anonymous_id else None
+        if customer_id:
+            customer = SimpleNamespace(id=customer_id)
+        else:
+            customer = await get_or_create_customer(email, anonymous_id or request.user_id)
+            if anonymous_id:
+                cache_customer_id(anonymous_id, customer.id, email)
+        if settings.SUBSCRIPTION_COUNT_FROM_STRIPE:
+            subscription_count = await get_customer_subscription_count(customer.id)
+        else:
+            subscription_count = count_customer_subscriptions(db, customer.id)
 
         if subscription_count >= MAX_RESUBSCRIPTIONS:
             raise HTTPException(
@@ -132,30 +204,18 @@ async def create_checkout_session(
             )
 
         # Create checkout session
-        session = stripe.checkout.Session.create(
+        metadata = {
+            "anonymous_id": anonymous_id or "",
+            "user_id": request.user_id or "",
+            "subscription_number": str(subscription_count + 1),
+        }
+        session = await async_stripe_call(
+            stripe.checkout.Session.create,
+            **CHECKOUT_SESSION_PARAMS,
             customer=customer.id,
-            payment_method_types=["card"],
-            line_items=[
-                {
-                    "price": PRICE_ID,  # Use pre-configured price with trial
-                    "quantity": 1,
-                }
-            ],
-            mode="subscription",
-            success_url=f"{os.getenv('FRONTEND_URL', 'https://jobmatch.zip')}/dashboard?subscription=success&session_id={{CHECKOUT_SESSION_ID}}",
-            cancel_url=f"{os.getenv('FRONTEND_URL', 'https://jobmatch.zip')}/",
-            metadata={
-                "anonymous_id": anonymous_id or "",
-                "user_id": request.user_id or "",
-                "subscription_number": str(subscription_count + 1),
-            },
+            metadata=metadata,
             subscription_data={
-                "metadata": {
-                    "anonymous_id": anonymous_id or "",
-                    "user_id": request.user_id or "",
-                    "subscription_number": str(subscription_count + 1),
-                    "start_date": datetime.utcnow().isoformat(),
-                }
+                "metadata": {**metadata, "start_date": datetime.utcnow().isoformat()}
             },
         )
 
@@ -172,31 +232,30 @@ async def create_checkout_session(
 
 
 @router.get("/status/{customer_id}")
-async def get_subscription_status(customer_id: str):
+async def get_subscription_status(customer_id: str, db: Session = Depends(get_db)):
     """Get subscription status for a customer."""
     try:
-        subscriptions = stripe.Subscription.list(
-            customer=customer_id, status="all", limit=100
+        return await get_cached_status(
+            f"sub_status:{customer_id}",
+            lambda: fetch_subscription_status(customer_id, db)
         )
+    except stripe.error.StripeError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e)})
 
-        active_subscription = next(
-            (sub for sub in subscriptions.data if sub.status in ["active", "trialing"]),
-            None
-        )
 
-        subscription_count = len([
-            sub for sub in subscriptions.data if sub.status != "canceled"
-        ])
+def fetch_subscription_status(customer_id: str, db: Session) -> dict:
+    """Build the subscription status response for a customer."""
+    active_subscription = find_active_subscription(customer_id)
 
-        return {
-            "has_active_subscription": active_subscription is not None,
-            "subscription": active_subscription,
-            "subscription_count": subscription_count,
-            "max_subscriptions": MAX_RESUBSCRIPTIONS,
-            "can_resubscribe": subscription_count < MAX_RESUBSCRIPTIONS,
-        }
-    except stripe.error.StripeError as e:
-        raise HTTPException(status_code=400, detail={"error": str(e)})
+    subscription_count = count_customer_subscriptions(db, customer_id, include_canceled=False)
+
+    return {
+        "has_active_subscription": active_subscription is not None,
+        "subscription": active_subscription,
+        "subscription_count": subscription_count,
+        "max_subscriptions": MAX_RESUBSCRIPTIONS,
+        "can_resubscribe": subscription_count < MAX_RESUBSCRIPTIONS,
+    }
 
 
 @router.get("/status-by-anonymous-id/{anonymous_id}")
@@ -209,60 +268,10 @@ async def get_subscription_status_by_anonymous_id(
     Maintains zero-knowledge - only returns subscription status, not identity.
     """
     try:
-        # Find user by anonymous_id
-        user = db.query(AnonymousUser).filter(AnonymousUser.id == anonymous_id).first()
-        if not user:
-            return {
-                "has_active_subscription": False,
-                "anonymous_id": anonymous_id,
-                "message": "User not found"
-            }
-        
-        # Get email from user's linked accounts
-        email = None
-        if user.meta_data:
-            if "emails" in user.meta_data and user.meta_data["emails"]:
-                email = user.meta_data["emails"][0].get("address")
-            elif "social_accounts" in user.meta_data:
-                if "google" in user.meta_data["social_accounts"]:
-                    email = user.meta_data["social_accounts"]["google"].get("provider_data", {}).get("email")
-        
-        if not email:
-            return {
-                "has_active_subscription": False,
-                "anonymous_id": anonymous_id,
-                "message": "No email linked to anonymous account"
-            }
-        
-        # Find Stripe customer by email
-        customers = stripe.Customer.list(email=email, limit=1)
-        if not customers.data:
-            return {
-                "has_active_subscription": False,
-                "anonymous_id": anonymous_id
-            }
-        
-        customer = customers.data[0]
-        
-        # Get subscription status
-        subscriptions = stripe.Subscription.list(
-            customer=customer.id, status="all", limit=100
-        )
-
-        active_subscription = next(
-            (sub for sub in subscriptions.data if sub.status in ["active", "trialing"]),
-            None
+        return await get_cached_status(
+            f"sub_status_anon:{anonymous_id}",
+            lambda: fetch_subscription_status_by_anonymous_id(anonymous_id, db)
         )
-
-        return {
-            "has_active_subscription": active_subscription is not None,
-            "subscription": {
-                "id": active_subscription.id if active_subscription else None,
-                "status": active_subscription.status if active_subscription else None,
-                "current_period_end": active_subscription.current_period_end if active_subscription else None,
-            } if active_subscription else None,
-            "anonymous_id": anonymous_id
-        }
     except stripe.error.StripeError as e:
         raise HTTPException(status_code=400, detail={"error": str(e)})
     except Exception as e:
@@ -270,11 +279,55 @@ async def get_subscription_status_by_anonymous_id(
         raise HTTPException(status_code=500, detail={"error": str(e)})
 
 
+def fetch_subscription_status_by_anonymous_id(anonymous_id: str, db: Session) -> dict:
+    """Build the subscription status response for an anonymous user from Stripe."""
+    customer_id = get_cached_customer_id(anonymous_id)
+    if customer_id:
+        return build_anonymous_status(anonymous_id, find_active_subscription(customer_id))
+    
+    # Get email from user's linked accounts
+    email = get_primary_email(db, anonymous_id)
+    if not email:
+        user_exists = db.query(AnonymousUser.id).filter(AnonymousUser.id == anonymous_id).first()
+        return {
+            "has_active_subscription": False,
+            "anonymous_id": anonymous_id,
+            "message": "No email linked to anonymous account" if user_exists else "User not found"
+        }
+    
+    # Find Stripe customer by email
+    customers = stripe_call(stripe.Customer.list, email=email, limit=1)
+    if not customers.data:
+        return {
+            "has_active_subscription": False,
+            "anonymous_id": anonymous_id
+        }
+    
+    customer = customers.data[0]
+    cache_customer_id(anonymous_id, customer.id, email)
+    
+    # Get subscription status
+    return build_anonymous_status(anonymous_id, find_active_subscription(customer.id))
+
+
+def build_anonymous_status(anonymous_id: str, active_subscription) -> dict:
+    """Shape the status-by-anonymous-id response for a resolved Stripe customer."""
+    return {
+        "has_active_subscription": active_subscription is not None,
+        "subscription": {
+            "id": active_subscription.id if active_subscription else None,
+            "status": active_subscription.status if active_subscription else None,
+            "current_period_end": active_subscription.current_period_end if active_subscription else None,
+        } if active_subscription else None,
+        "anonymous_id": anonymous_id
+    }
+
+
 @router.post("/cancel")
 async def cancel_subscription(request: CancelSubscriptionRequest):
     """Cancel an active subscription."""
     try:
-        subscription = stripe.Subscription.cancel(request.subscription_id)
+        subscription = await async_stripe_call(stripe.Subscription.cancel, request.subscription_id)
         return {
             "success": True,
             "subscription": subscription,
@@ -291,9 +344,13 @@ async def request_refund(request: RefundRequest):
     After 14 days, user must request credits instead.
     """
     try:
-        subscription = stripe.Subscription.retrieve(request.subscription_id)
-        subscription_start = datetime.fromtimestamp(subscription.created)
-        days_since_start = (datetime.utcnow() - subscription_start).days
+        # Latest invoice comes back inline so no separate Invoice.list is needed
+        subscription = await async_stripe_call(
+            stripe.Subscription.retrieve,
+            request.subscription_id,
+            expand=["latest_invoice"]
+        )
+        days_since_start = days_since(subscription.created)
 
         # Check if within 14-day refund period
         if days_since_start > REFUND_PERIOD_DAYS:
@@ -306,17 +363,16 @@ async def request_refund(request: RefundRequest):
                 }
             )
 
-        # Get latest invoice
-        invoices = stripe.Invoice.list(subscription=request.subscription_id, limit=1)
-        if not invoices.data:
+        invoice = subscription.latest_invoice
+        if not invoice:
             raise HTTPException(status_code=404, detail={"error": "No invoices found"})
 
-        invoice = invoices.data[0]
         if not invoice.payment_intent:
             raise HTTPException(status_code=400, detail={"error": "No payment found"})
 
         # Create refund
-        refund = stripe.Refund.create(
+        refund = await async_stripe_call(
+            stripe.Refund.create,
             payment_intent=invoice.payment_intent,
             reason="requested_by_customer",
             metadata={
@@ -326,7 +382,7 @@ async def request_refund(request: RefundRequest):
         )
 
         # Cancel subscription
-        stripe.Subscription.cancel(request.subscription_id)
+        await async_stripe_call(stripe.Subscription.cancel, request.subscription_id)
 
         return {
             "success": True,
@@ -338,15 +394,14 @@ async def request_refund(request: RefundRequest):
 
 
 @router.post("/request-credits")
-async def request_credits(request: CreditRequest, db: Session = Depends(get_db)):
+async def request_credits(request: CreditRequestIn, db: Session = Depends(get_db)):
     """
     Request credits within 60 days (requires written correspondence).
     Credits must be manually reviewed by support team.
     """
     try:
-        subscription = stripe.Subscription.retrieve(request.subscription_id)
-        subscription_start = datetime.fromtimestamp(subscription.created)
-        days_since_start = (datetime.utcnow() - subscription_start).days
+        subscription = await async_stripe_call(stripe.Subscription.retrieve, request.subscription_id)
+        days_since_start = days_since(subscription.created)
 
         if days_since_start > CREDIT_PERIOD_DAYS:
             return JSONResponse(
@@ -382,7 +437,7 @@ async def request_credits(request: CreditRequest, db: Session = Depends(get_db))
             # Send email to support team
             try:
                 email_manager = create_email_manager()
-                support_email = os.getenv("SUPPORT_EMAIL", "support@jobmatch.zip")
+                support_email = settings.SUPPORT_EMAIL
                 
                 subject = f"Credit Request - Subscription {request.subscription_id[:8]}..."
                 html_body = generate_credit_request_email_html(credit_request, request)
@@ -390,14 +445,14 @@ async def request_credits(request: CreditRequest, db: Session = Depends(get_db))
                 
                 result = await email_manager.send_email(support_email, subject, html_body, text_body)
                 if result.get("success"):
-                    print(f"Credit request notification sent to support team: {support_email}")
+                    logger.info(f"Credit request notification sent to support team: {redact_email(support_email)}")
                 else:
-                    print(f"Failed to send credit request email: {result.get('error')}")
+                    logger.warning(f"Failed to send credit request email: {result.get('error')}")
             except Exception as e:
-                print(f"Error sending credit request email: {e}")
+                logger.error(f"Error sending credit request email: {e}")
                 # Don't fail the request if email fails
             
-            print(f"Credit request created: ID {credit_request.id}, Subscription: {request.subscription_id}")
+            logger.info(f"Credit request created: ID {credit_request.id}, Subscription: {request.subscription_id}")
             
             return {
                 "success": True,
@@ -412,7 +467,7 @@ async def request_credits(request: CreditRequest, db: Session = Depends(get_db))
             }
         except Exception as e:
             db.rollback()
-            print(f"Error storing credit request: {e}")
+            logger.error(f"Error storing credit request: {e}", exc_info=True)
             # Still return success to user, but log the error
             return {
                 "success": True,
@@ -431,14 +486,19 @@ async def request_credits(request: CreditRequest, db: Session = Depends(get_db))
 @router.post("/webhook")
 async def stripe_webhook(
     request: Request,
+    background_tasks: BackgroundTasks,
     stripe_signature: str = Header(None, alias="stripe-signature"),
     db: Session = Depends(get_db)
 ):
     """
     Stripe webhook handler for subscription events.
     Configure this URL in your Stripe Dashboard: https://jobmatch.zip/api/subscription/webhook
+    
+    The event's DB writes commit before Stripe is acknowledged, so a failure
+    returns 500 and Stripe redelivers the event; the emails it triggers are
+    sent after the response so slow SMTP calls don't hit Stripe's timeout.
     """
-    webhook_secret = os.getenv("STRIPE_WEBHOOK_SECRET")
+    webhook_secret = settings.STRIPE_WEBHOOK_SECRET
     if not webhook_secret:
         raise HTTPException(status_code=500, detail={"error": "Webhook secret not configured"})
 
@@ -453,468 +513,433 @@ async def stripe_webhook(
     except stripe.error.SignatureVerificationError as e:
         raise HTTPException(status_code=400, detail={"error": "Invalid signature"})
 
-    # Handle the event
+    # An event id is only recorded once its processing commits, so a known id
+    # means Stripe is redelivering an event that was already applied
+    if db.get(StripeEvent, event["id"]):
+        return {"received": True, "deduped": True}
+
+    data = event["data"]["object"]
+    try:
+        pending_emails = process_stripe_event(db, event)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error processing webhook event {event['id']}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail={"error": "Webhook processing failed"})
+    finally:
+        invalidate_status_cache(
+            data.get("customer"),
+            (data.get("metadata") or {}).get("anonymous_id")
+        )
+
+    if pending_emails is None:
+        return {"received": True, "deduped": True}
+
+    for pending_email in pending_emails:
+        background_tasks.add_task(send_event_email, *pending_email)
+    return {"received": True}
+
+
+def process_stripe_event(db: Session, event) -> Optional[list]:
+    """
+    Apply a verified Stripe webhook event and commit it with its dedup row.
+
+    Returns the emails to send now that the writes have committed, as
+    send_event_email argument tuples, or None if the event was already
+    processed. Errors propagate so the webhook can ask Stripe to retry.
+    """
     event_type = event["type"]
     data = event["data"]["object"]
 
+    # The dedup row commits (or rolls back) with the event's writes; flushing
+    # it first turns a concurrent duplicate delivery into an IntegrityError
+    db.add(StripeEvent(event_id=event["id"], event_type=event_type))
     try:
-        if event_type == "checkout.session.completed":
-            print(f"Checkout completed: {data['id']}")
-            # Extract anonymous_id and customer info from metadata
-            metadata = data.get("metadata", {})
-            anonymous_id = metadata.get("anonymous_id")
-            customer_email = data.get("customer_email") or data.get("customer_details", {}).get("email")
-            customer_id = data.get("customer")
-            subscription_id = data.get("subscription")
-            
-            # Create or update subscription record
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        logger.info(f"Skipping already processed webhook event {event['id']}")
+        return None
+
+    # Emails are queued while the event is applied and only sent once its
+    # DB writes have committed
+    pending_emails = []
+    if event_type == "checkout.session.completed":
+        logger.debug(f"Checkout completed: {data['id']}")
+        # Extract anonymous_id and customer info from metadata
+        metadata = data.get("metadata", {})
+        anonymous_id = metadata.get("anonymous_id")
+        customer_email = data.get("customer_email") or data.get("customer_details", {}).get("email")
+        customer_id = data.get("customer")
+        subscription_id = data.get("subscription")
+        
+        # Create or update subscription record
+        if subscription_id:
+            updates = {"stripe_checkout_session_id": data['id'], "status": "active"}
+            if customer_email:
+                updates["email"] = customer_email
+            if anonymous_id:
+                updates["anonymous_id"] = anonymous_id
+            upsert_subscription(db, {
+                "stripe_subscription_id": subscription_id,
+                "stripe_customer_id": customer_id,
+                "stripe_checkout_session_id": data['id'],
+                "anonymous_id": anonymous_id,
+                "email": customer_email,
+                "status": "active",
+                "metadata": metadata,
+            }, updates)
+            logger.info(f"Subscription record created/updated: {subscription_id}")
+
+    elif event_type == "customer.subscription.created":
+        logger.debug(f"Subscription created: {data['id']}")
+        subscription_id = data['id']
+        customer_id = data.get("customer")
+        anonymous_id = data.get("metadata", {}).get("anonymous_id")
+        
+        # Create subscription record; an existing row is left untouched
+        upsert_subscription(db, {
+            "stripe_subscription_id": subscription_id,
+            "stripe_customer_id": customer_id,
+            "anonymous_id": anonymous_id,
+            "status": data.get("status", "active"),
+            "current_period_start": stripe_datetime(data.get("current_period_start")),
+            "current_period_end": stripe_datetime(data.get("current_period_end")),
+            "cancel_at_period_end": data.get("cancel_at_period_end", False),
+            "metadata": data.get("metadata", {}),
+        })
+        logger.info(f"Subscription activated: {subscription_id} for anonymous_id: {anonymous_id}")
+
+    elif event_type == "customer.subscription.updated":
+        logger.debug(f"Subscription updated: {data['id']}")
+        subscription_id = data['id']
+        anonymous_id = data.get("metadata", {}).get("anonymous_id")
+        
+        # Update subscription record, creating it if it doesn't exist
+        values = {
+            "stripe_subscription_id": subscription_id,
+            "stripe_customer_id": data.get("customer"),
+            "anonymous_id": anonymous_id,
+            "status": data.get("status", "active"),
+            "current_period_start": stripe_datetime(data.get("current_period_start")),
+            "current_period_end": stripe_datetime(data.get("current_period_end")),
+            "cancel_at_period_end": data.get("cancel_at_period_end", False),
+            "metadata": data.get("metadata", {}),
+        }
+        updates = {}
+        if "status" in data:
+            updates["status"] = values["status"]
+        if values["current_period_start"]:
+            updates["current_period_start"] = values["current_period_start"]
+        if values["current_period_end"]:
+            updates["current_period_end"] = values["current_period_end"]
+        if "cancel_at_period_end" in data:
+            updates["cancel_at_period_end"] = values["cancel_at_period_end"]
+        if anonymous_id:
+            updates["anonymous_id"] = anonymous_id
+        upsert_subscription(db, values, updates)
+        logger.info(f"Subscription updated: {subscription_id}, status: {values['status']}")
+
+    elif event_type == "customer.subscription.deleted":
+        logger.debug(f"Subscription deleted: {data['id']}")
+        subscription_id = data['id']
+        anonymous_id = data.get("metadata", {}).get("anonymous_id")
+        canceled_at = datetime.utcnow()
+        
+        # Mark subscription canceled, creating a canceled record if it doesn't exist
+        upsert_subscription(db, {
+            "stripe_subscription_id": subscription_id,
+            "stripe_customer_id": data.get("customer"),
+            "anonymous_id": anonymous_id,
+            "status": "canceled",
+            "canceled_at": canceled_at,
+            "metadata": data.get("metadata", {}),
+        }, {
+            "status": "canceled",
+            "canceled_at": canceled_at,
+            "cancel_at_period_end": False,
+        })
+        logger.info(f"Subscription deactivated: {subscription_id} for anonymous_id: {anonymous_id}")
+
+    elif event_type == "invoice.payment_succeeded":
+        logger.debug(f"Payment succeeded: {data['id']}")
+        customer_email = data.get("customer_email")
+        amount_paid = data.get("amount_paid", 0) / 100  # Convert from cents
+        invoice_url = data.get("hosted_invoice_url", "")
+        subscription_id = data.get("subscription")
+        
+        if customer_email:
+            # Get subscription details for email
+            subscription_info = None
             if subscription_id:
-                subscription = db.query(Subscription).filter(
+                db_subscription = db.query(Subscription).filter(
                     Subscription.stripe_subscription_id == subscription_id
                 ).first()
-                
-                if not subscription:
-                    subscription = Subscription(
-                        stripe_subscription_id=subscription_id,
-                        stripe_customer_id=customer_id,
-                        stripe_checkout_session_id=data['id'],
-                        anonymous_id=anonymous_id,
-                        email=customer_email,
-                        status="active",
-                        meta_data=metadata
-                    )
-                    db.add(subscription)
-                else:
-                    subscription.stripe_checkout_session_id = data['id']
-                    subscription.email = customer_email or subscription.email
-                    subscription.anonymous_id = anonymous_id or subscription.anonymous_id
-                    subscription.status = "active"
-                
-                db.commit()
-                print(f"Subscription record created/updated: {subscription_id}")
-
-        elif event_type == "customer.subscription.created":
-            print(f"Subscription created: {data['id']}")
-            subscription_id = data['id']
-            customer_id = data.get("customer")
-            anonymous_id = data.get("metadata", {}).get("anonymous_id")
-            
-            # Get subscription details from Stripe
-            stripe_subscription = stripe.Subscription.retrieve(subscription_id)
-            
-            # Create subscription record
-            subscription = db.query(Subscription).filter(
-                Subscription.stripe_subscription_id == subscription_id
-            ).first()
+                if db_subscription:
+                    subscription_info = {
+                        "current_period_end": db_subscription.current_period_end.isoformat() if db_subscription.current_period_end else None,
+                        "status": db_subscription.status
+                    }
             
-            if not subscription:
-                subscription = Subscription(
-                    stripe_subscription_id=subscription_id,
-                    stripe_customer_id=customer_id,
-                    anonymous_id=anonymous_id,
-                    status=data.get("status", "active"),
-                    current_period_start=datetime.fromtimestamp(data.get("current_period_start", 0)) if data.get("current_period_start") else None,
-                    current_period_end=datetime.fromtimestamp(data.get("current_period_end", 0)) if data.get("current_period_end") else None,
-                    cancel_at_period_end=data.get("cancel_at_period_end", False),
-                    meta_data=data.get("metadata", {})
-                )
-                db.add(subscription)
-                db.commit()
-                print(f"Subscription activated: {subscription_id} for anonymous_id: {anonymous_id}")
-
-        elif event_type == "customer.subscription.updated":
-            print(f"Subscription updated: {data['id']}")
-            subscription_id = data['id']
-            anonymous_id = data.get("metadata", {}).get("anonymous_id")
-            
-            # Update subscription record
-            subscription = db.query(Subscription).filter(
-                Subscription.stripe_subscription_id == subscription_id
-            ).first()
-            
-            if subscription:
-                subscription.status = data.get("status", subscription.status)
-                subscription.current_period_start = datetime.fromtimestamp(data.get("current_period_start", 0)) if data.get("current_period_start") else subscription.current_period_start
-                subscription.current_period_end = datetime.fromtimestamp(data.get("current_period_end", 0)) if data.get("current_period_end") else subscription.current_period_end
-                subscription.cancel_at_period_end = data.get("cancel_at_period_end", subscription.cancel_at_period_end)
-                
+            pending_emails.append((
+                customer_email,
+                f"Payment Receipt - ${amount_paid:.2f} - JobMatch.zip",
+                generate_receipt_email_html(amount_paid, invoice_url, subscription_info),
+                generate_receipt_email_text(amount_paid, invoice_url, subscription_info),
+                "receipt email",
+            ))
+
+    elif event_type == "invoice.payment_failed":
+        logger.debug(f"Payment failed: {data['id']}")
+        customer_email = data.get("customer_email")
+        subscription_id = data.get("subscription")
+        amount_due = data.get("amount_due", 0) / 100  # Convert from cents
+        invoice_url = data.get("hosted_invoice_url", "")
+        attempt_count = data.get("attempt_count", 1)
+        
+        if customer_email:
+            pending_emails.append((
+                customer_email,
+                "Payment Failed - Action Required - JobMatch.zip",
+                generate_payment_failed_email_html(amount_due, invoice_url, attempt_count),
+                generate_payment_failed_email_text(amount_due, invoice_url, attempt_count),
+                "payment failure email",
+            ))
+
+    elif event_type in ("customer.updated", "customer.deleted"):
+        # Drop anonymous_id/email -> customer mappings that may no longer hold
+        previous = event["data"].get("previous_attributes") or {}
+        if event_type == "customer.deleted" or "metadata" in previous:
+            for metadata in (data.get("metadata"), previous.get("metadata")):
+                anonymous_id = (metadata or {}).get("anonymous_id")
                 if anonymous_id:
-                    subscription.anonymous_id = anonymous_id
-                
-                db.commit()
-                print(f"Subscription updated: {subscription_id}, status: {subscription.status}")
-            else:
-                # Create if doesn't exist
-                subscription = Subscription(
-                    stripe_subscription_id=subscription_id,
-                    stripe_customer_id=data.get("customer"),
-                    anonymous_id=anonymous_id,
-                    status=data.get("status", "active"),
-                    current_period_start=datetime.fromtimestamp(data.get("current_period_start", 0)) if data.get("current_period_start") else None,
-                    current_period_end=datetime.fromtimestamp(data.get("current_period_end", 0)) if data.get("current_period_end") else None,
-                    cancel_at_period_end=data.get("cancel_at_period_end", False),
-                    meta_data=data.get("metadata", {})
-                )
-                db.add(subscription)
-                db.commit()
-
-        elif event_type == "customer.subscription.deleted":
-            print(f"Subscription deleted: {data['id']}")
-            subscription_id = data['id']
-            anonymous_id = data.get("metadata", {}).get("anonymous_id")
-            
-            # Update subscription status to canceled
-            subscription = db.query(Subscription).filter(
-                Subscription.stripe_subscription_id == subscription_id
-            ).first()
-            
-            if subscription:
-                subscription.status = "canceled"
-                subscription.canceled_at = datetime.utcnow()
-                subscription.cancel_at_period_end = False
-                db.commit()
-                print(f"Subscription deactivated: {subscription_id} for anonymous_id: {anonymous_id}")
-            else:
-                # Create canceled record if doesn't exist
-                subscription = Subscription(
-                    stripe_subscription_id=subscription_id,
-                    stripe_customer_id=data.get("customer"),
-                    anonymous_id=anonymous_id,
-                    status="canceled",
-                    canceled_at=datetime.utcnow(),
-                    meta_data=data.get("metadata", {})
-                )
-                db.add(subscription)
-                db.commit()
-
-        elif event_type == "invoice.payment_succeeded":
-            print(f"Payment succeeded: {data['id']}")
-            customer_email = data.get("customer_email")
-            amount_paid = data.get("amount_paid", 0) / 100  # Convert from cents
-            invoice_url = data.get("hosted_invoice_url", "")
-            subscription_id = data.get("subscription")
-            
-            if customer_email:
-                try:
-                    email_manager = create_email_manager()
-                    
-                    # Get subscription details for email
-                    subscription_info = None
-                    if subscription_id:
-                        db_subscription = db.query(Subscription).filter(
-                            Subscription.stripe_subscription_id == subscription_id
-                        ).first()
-                        if db_subscription:
-                            subscription_info = {
-                                "current_period_end": db_subscription.current_period_end.isoformat() if db_subscription.current_period_end else None,
-                                "status": db_subscription.status
-                            }
-                    
-                    subject = f"Payment Receipt - ${amount_paid:.2f} - JobMatch.zip"
-                    html_body = generate_receipt_email_html(amount_paid, invoice_url, subscription_info)
-                    text_body = generate_receipt_email_text(amount_paid, invoice_url, subscription_info)
-                    
-                    result = await email_manager.send_email(customer_email, subject, html_body, text_body)
-                    if result.get("success"):
-                        print(f"Receipt email sent to {customer_email}")
-                    else:
-                        print(f"Failed to send receipt email: {result.get('error')}")
-                except Exception as e:
-                    print(f"Error sending receipt email: {e}")
-
-        elif event_type == "invoice.payment_failed":
-            print(f"Payment failed: {data['id']}")
-            customer_email = data.get("customer_email")
-            subscription_id = data.get("subscription")
-            amount_due = data.get("amount_due", 0) / 100  # Convert from cents
-            invoice_url = data.get("hosted_invoice_url", "")
-            attempt_count = data.get("attempt_count", 1)
-            
-            if customer_email:
-                try:
-                    email_manager = create_email_manager()
-                    
-                    subject = f"Payment Failed - Action Required - JobMatch.zip"
-                    html_body = generate_payment_failed_email_html(amount_due, invoice_url, attempt_count)
-                    text_body = generate_payment_failed_email_text(amount_due, invoice_url, attempt_count)
-                    
-                    result = await email_manager.send_email(customer_email, subject, html_body, text_body)
-                    if result.get("success"):
-                        print(f"Payment failure notification sent to {customer_email}")
-                    else:
-                        print(f"Failed to send payment failure email: {result.get('error')}")
-                except Exception as e:
-                    print(f"Error sending payment failure email: {e}")
+                    scaling_manager.cache_delete(f"anon:{anonymous_id}")
+        if event_type == "customer.deleted" or "metadata" in previous or "email" in previous:
+            for email in (data.get("email"), previous.get("email")):
+                if email:
+                    scaling_manager.cache_delete(customer_email_cache_key(email))
 
-        else:
-            print(f"Unhandled event type: {event_type}")
-    
-    except Exception as e:
-        print(f"Error processing webhook event: {e}")
-        db.rollback()
-        raise HTTPException(status_code=500, detail={"error": f"Webhook processing failed: {str(e)}"})
+    else:
+        logger.debug(f"Unhandled event type: {event_type}")
 
-    return {"received": True}
+    db.commit()
+    return pending_emails
 
 
-# Email template functions
-def generate_receipt_email_html(amount: float, invoice_url: str = "", subscription_info: Optional[dict] = None) -> str:
-    """Generate HTML receipt email."""
-    period_end = ""
-    if subscription_info and subscription_info.get("current_period_end"):
-        from datetime import datetime
-        try:
-            end_date = datetime.fromisoformat(subscription_info["current_period_end"].replace('Z', '+00:00'))
-            period_end = f"<p><strong>Next billing date:</strong> {end_date.strftime('%B %d, %Y')}</p>"
-        except:
-            pass
-    
-    invoice_link = f'<p><a href="{invoice_url}" style="color: #667eea; text-decoration: none;">View Invoice</a></p>' if invoice_url else ""
-    
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Payment Receipt - JobMatch.zip</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-            .amount {{ font-size: 48px; font-weight: bold; color: #28a745; text-align: center; margin: 20px 0; }}
-            .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 14px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>✅ Payment Received</h1>
-                <p>Thank you for your subscription!</p>
-            </div>
-            <div class="content">
-                <div class="amount">${amount:.2f}</div>
-                <p style="text-align: center; font-size: 18px;">Your payment has been successfully processed.</p>
-                {period_end}
-                {invoice_link}
-                <p style="margin-top: 30px;">Thank you for being a JobMatch.zip subscriber!</p>
-            </div>
-            <div class="footer">
-                <p>JobMatch.zip - Making job matching smarter</p>
-                <p>This is an automated message, please do not reply.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+async def send_event_email(to_email: str, subject: str, html_body: str, text_body: str, description: str) -> None:
+    """Send an email triggered by a webhook event; failures are logged, not raised."""
+    try:
+        email_manager = create_email_manager()
+        result = await email_manager.send_email(to_email, subject, html_body, text_body)
+        if result.get("success"):
+            logger.info(f"Sent {description} to {redact_email(to_email)}")
+        else:
+            logger.warning(f"Failed to send {description}: {result.get('error')}")
+    except Exception as e:
+        logger.error(f"Error sending {description}: {e}")
 
 
-def generate_receipt_email_text(amount: float, invoice_url: str = "", subscription_info: Optional[dict] = None) -> str:
-    """Generate plain text receipt email."""
-    period_end = ""
-    if subscription_info and subscription_info.get("current_period_end"):
-        from datetime import datetime
+# Helper functions
+async def get_cached_status(cache_key: str, fetch: Callable[[], dict]):
+    """
+    Serve a status response from Redis while it is fresh, otherwise fetch it.
+    If Stripe is unreachable or rate-limiting, fall back to the last cached
+    response (marked with X-Cache: STALE) instead of failing.
+    """
+    cached = None
+    raw = scaling_manager.cache_get(cache_key)
+    if raw:
         try:
-            end_date = datetime.fromisoformat(subscription_info["current_period_end"].replace('Z', '+00:00'))
-            period_end = f"\nNext billing date: {end_date.strftime('%B %d, %Y')}\n"
-        except:
-            pass
+            cached = json.loads(raw)
+        except ValueError:
+            cached = None
     
-    invoice_text = f"\nView invoice: {invoice_url}\n" if invoice_url else ""
+    if cached and time.time() - cached["ts"] < STATUS_CACHE_FRESH_SECONDS:
+        return JSONResponse(content=cached["body"], headers={"X-Cache": "HIT"})
+    
+    try:
+        # fetch makes blocking Stripe calls; run it off the event loop
+        body = await asyncio.to_thread(fetch)
+    except (stripe.error.APIConnectionError, stripe.error.RateLimitError):
+        if cached:
+            return JSONResponse(content=cached["body"], headers={"X-Cache": "STALE"})
+        raise
     
-    return f"""
-Payment Receipt - JobMatch.zip
+    scaling_manager.cache_set(
+        cache_key,
+        json.dumps({"ts": time.time(), "body": body}),
+        ttl=STATUS_CACHE_STALE_SECONDS
+    )
+    return body
 
-✅ Payment Received
 
-Amount: ${amount:.2f}
+def invalidate_status_cache(customer_id: Optional[str] = None, anonymous_id: Optional[str] = None):
+    """Drop cached status responses affected by a subscription change."""
+    if customer_id:
+        scaling_manager.cache_delete(f"sub_status:{customer_id}")
+    if anonymous_id:
+        scaling_manager.cache_delete(f"sub_status_anon:{anonymous_id}")
 
-Your payment has been successfully processed.
-{period_end}{invoice_text}
-Thank you for being a JobMatch.zip subscriber!
 
----
-JobMatch.zip - Making job matching smarter
-This is an automated message, please do not reply.
+def upsert_subscription(db: Session, values: dict, updates: Optional[dict] = None) -> None:
     """
+    Insert a subscription row keyed on stripe_subscription_id in one round trip.
 
-
-def generate_payment_failed_email_html(amount: float, invoice_url: str = "", attempt_count: int = 1) -> str:
-    """Generate HTML payment failure email."""
-    invoice_link = f'<p><a href="{invoice_url}" style="display: inline-block; background: #dc3545; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; margin: 20px 0;">Update Payment Method</a></p>' if invoice_url else ""
-    attempt_text = f"<p><strong>Attempt #{attempt_count}</strong> - " if attempt_count > 1 else ""
-    
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Payment Failed - JobMatch.zip</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background: linear-gradient(135deg, #dc3545 0%, #c82333 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-            .amount {{ font-size: 36px; font-weight: bold; color: #dc3545; text-align: center; margin: 20px 0; }}
-            .warning-box {{ background: #fff3cd; border-left: 4px solid #ffc107; padding: 15px; margin: 20px 0; }}
-            .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 14px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>⚠️ Payment Failed</h1>
-                <p>Action Required</p>
-            </div>
-            <div class="content">
-                <div class="amount">${amount:.2f}</div>
-                <p style="text-align: center; font-size: 18px;">We were unable to process your payment.</p>
-                {attempt_text}
-                <div class="warning-box">
-                    <p><strong>What to do:</strong></p>
-                    <ol>
-                        <li>Update your payment method</li>
-                        <li>Ensure sufficient funds are available</li>
-                        <li>Contact your bank if the issue persists</li>
-                    </ol>
-                </div>
-                {invoice_link}
-                <p style="margin-top: 30px;">Your subscription will remain active for a few more days. Please update your payment method to avoid service interruption.</p>
-            </div>
-            <div class="footer">
-                <p>JobMatch.zip - Making job matching smarter</p>
-                <p>This is an automated message, please do not reply.</p>
-            </div>
-        </div>
-    </body>
-    </html>
+    ``values`` and ``updates`` are keyed by column name. On conflict the existing
+    row receives ``updates``; when ``updates`` is None it is left untouched.
     """
+    stmt = pg_insert(Subscription.__table__).values(values)
+    if updates is None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=["stripe_subscription_id"])
+    else:
+        # ON CONFLICT DO UPDATE bypasses the column's onupdate hook
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["stripe_subscription_id"],
+            set_={**updates, "updated_at": datetime.utcnow()}
+        )
+    db.execute(stmt)
 
 
-def generate_payment_failed_email_text(amount: float, invoice_url: str = "", attempt_count: int = 1) -> str:
-    """Generate plain text payment failure email."""
-    attempt_text = f"Attempt #{attempt_count} - " if attempt_count > 1 else ""
-    invoice_text = f"\nUpdate payment method: {invoice_url}\n" if invoice_url else ""
-    
-    return f"""
-Payment Failed - JobMatch.zip
-
-⚠️ Payment Failed - Action Required
+def days_since(timestamp: int) -> int:
+    """Whole days elapsed since a Stripe (Unix epoch) timestamp."""
+    return (int(time.time()) - timestamp) // SECONDS_PER_DAY
 
-Amount: ${amount:.2f}
 
-{attempt_text}We were unable to process your payment.
+def stripe_datetime(timestamp: Optional[int]) -> Optional[datetime]:
+    """Convert an optional Stripe timestamp to a datetime for DB columns."""
+    return datetime.fromtimestamp(timestamp) if timestamp else None
 
-What to do:
-1. Update your payment method
-2. Ensure sufficient funds are available
-3. Contact your bank if the issue persists
-{invoice_text}
-Your subscription will remain active for a few more days. Please update your payment method to avoid service interruption.
 
----
-JobMatch.zip - Making job matching smarter
-This is an automated message, please do not reply.
+def get_cached_customer_id(anonymous_id: str, email: Optional[str] = None) -> Optional[str]:
+    """
+    Return the Stripe customer id cached for an anonymous user, if any.
+    When ``email`` is given, the entry only counts if it was cached for that
+    email, so a user who switches email is resolved (and billed) afresh.
     """
+    cached = scaling_manager.cache_get(f"anon:{anonymous_id}")
+    if not cached:
+        return None
+    customer_id, _, email_digest = cached.partition(":")
+    if email is not None and email_digest != hashlib.sha256(email.encode("utf-8")).hexdigest():
+        return None
+    return customer_id
+
+
+def cache_customer_id(anonymous_id: str, customer_id: str, email: str):
+    """Remember which Stripe customer (resolved for which email) belongs to an anonymous user."""
+    email_digest = hashlib.sha256(email.encode("utf-8")).hexdigest()
+    scaling_manager.cache_set(
+        f"anon:{anonymous_id}", f"{customer_id}:{email_digest}", ttl=CUSTOMER_ID_CACHE_SECONDS
+    )
 
 
-def generate_credit_request_email_html(credit_request: CreditRequest, request: CreditRequest) -> str:
-    """Generate HTML credit request notification email for support team."""
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Credit Request - JobMatch.zip</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-            .info-box {{ background: #e7f3ff; border-left: 4px solid #667eea; padding: 15px; margin: 20px 0; }}
-            .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 14px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>💳 Credit Request</h1>
-                <p>New Request Received</p>
-            </div>
-            <div class="content">
-                <div class="info-box">
-                    <p><strong>Request ID:</strong> {credit_request.id}</p>
-                    <p><strong>Subscription ID:</strong> {request.subscription_id}</p>
-                    <p><strong>Customer Email:</strong> {request.email}</p>
-                    <p><strong>Days Since Start:</strong> {request.days_since_start}</p>
-                    <p><strong>Status:</strong> {credit_request.status}</p>
-                </div>
-                <h3>Reason:</h3>
-                <p style="background: white; padding: 15px; border-radius: 5px;">{request.reason}</p>
-                <p style="margin-top: 30px;"><strong>Action Required:</strong> Review and respond within 2 business days.</p>
-            </div>
-            <div class="footer">
-                <p>JobMatch.zip Support Team</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+def get_primary_email(db: Session, anonymous_id: str) -> Optional[str]:
+    """Get an anonymous user's first linked email from the generated primary_email column."""
+    return db.query(AnonymousUser.primary_email).filter(
+        AnonymousUser.id == anonymous_id
+    ).scalar()
+
 
+def find_active_subscription(customer_id: str):
+    """Return the customer's active (or trialing) subscription, fetching one object at a time."""
+    for status in ("active", "trialing"):
+        subscriptions = stripe_call(stripe.Subscription.list, customer=customer_id, status=status, limit=1)
+        if subscriptions.data:
+            return subscriptions.data[0]
+    return None
+
+
+async def get_or_create_customer(email: str, anonymous_id: Optional[str] = None):
+    """
+    Get existing customer or create new one.
+    Resolved customers are cached briefly by email (id and linked anonymous_id
+    only), so repeat lookups skip the Stripe search.
+    """
+    cache_key = customer_email_cache_key(email)
+    cached = scaling_manager.cache_get(cache_key)
+    if cached:
+        customer_id, _, linked_anonymous_id = cached.partition(":")
+        customer = SimpleNamespace(id=customer_id)
+    else:
+        # Indexed search rather than Customer.list(email=...), which scans
+        # customers newest-first. The search index lags writes by up to a
+        # minute; the email cache above covers customers created in that window.
+        customers = await async_stripe_call(
+            stripe.Customer.search,
+            query=f"email:'{stripe_search_quote(email)}'",
+            limit=1
+        )
+        if customers.data:
+            customer = customers.data[0]
+            linked_anonymous_id = customer.metadata.get("anonymous_id") or ""
+        else:
+            customer = await async_stripe_call(
+                stripe.Customer.create,
+                email=email,
+                metadata={"anonymous_id": anonymous_id or ""}
+            )
+            linked_anonymous_id = anonymous_id or ""
+    
+    # Update metadata if anonymous_id provided and not already recorded
+    changed = anonymous_id and linked_anonymous_id != anonymous_id
+    if changed:
+        await async_stripe_call(
+            stripe.Customer.modify,
+            customer.id,
+            metadata={"anonymous_id": anonymous_id}
+        )
+        linked_anonymous_id = anonymous_id
+    
+    if changed or not cached:
+        scaling_manager.cache_set(
+            cache_key, f"{customer.id}:{linked_anonymous_id}", ttl=CUSTOMER_EMAIL_CACHE_SECONDS
+        )
+    return customer
 
-def generate_credit_request_email_text(credit_request: CreditRequest, request: CreditRequest) -> str:
-    """Generate plain text credit request notification email for support team."""
-    return f"""
-Credit Request - JobMatch.zip
 
-💳 New Credit Request Received
+def stripe_search_quote(value: str) -> str:
+    """Escape a value for use inside a quoted Stripe search query term."""
+    return value.replace("\\", "\\\\").replace("'", "\\'")
 
-Request ID: {credit_request.id}
-Subscription ID: {request.subscription_id}
-Customer Email: {request.email}
-Days Since Start: {request.days_since_start}
-Status: {credit_request.status}
 
-Reason:
-{request.reason}
+def customer_email_cache_key(email: str) -> str:
+    """Redis key for the email -> customer cache; the email itself is hashed."""
+    return f"stripe_customer:{hashlib.sha256(email.encode('utf-8')).hexdigest()}"
 
-Action Required: Review and respond within 2 business days.
 
----
-JobMatch.zip Support Team
+def count_customer_subscriptions(db: Session, customer_id: str, include_canceled: bool = True) -> int:
     """
+    Count a customer's subscriptions from the webhook-maintained subscriptions
+    table instead of listing them from Stripe.
 
-
-# Helper functions
-async def get_or_create_customer(email: str, anonymous_id: Optional[str] = None):
-    """Get existing customer or create new one."""
-    customers = stripe.Customer.list(email=email, limit=1)
-    
-    if customers.data:
-        # Update metadata if anonymous_id provided
-        if anonymous_id:
-            stripe.Customer.modify(
-                customers.data[0].id,
-                metadata={"anonymous_id": anonymous_id}
-            )
-        return customers.data[0]
-    
-    return stripe.Customer.create(
-        email=email,
-        metadata={"anonymous_id": anonymous_id or ""}
+    Checkout counts every status (as Stripe's status="all" listing does), so
+    canceling and resubscribing still counts toward MAX_RESUBSCRIPTIONS; the
+    status endpoint passes include_canceled=False.
+    """
+    query = db.query(func.count(Subscription.id)).filter(
+        Subscription.stripe_customer_id == customer_id
     )
+    if not include_canceled:
+        query = query.filter(Subscription.status != "canceled")
+    return query.scalar() or 0
 
 
 async def get_customer_subscription_count(customer_id: str) -> int:
-    """Count total subscriptions for a customer."""
-    subscriptions = stripe.Subscription.list(
-        customer=customer_id, status="all", limit=100
-    )
-    return len(subscriptions.data)
+    """
+    Count total subscriptions for a customer from Stripe, following pagination.
 
+    Stripe is the authoritative count; count_customer_subscriptions counts the
+    same rows (every status) from the webhook-maintained mirror and is what
+    checkout uses unless SUBSCRIPTION_COUNT_FROM_STRIPE is set, so the flag
+    only changes where the count comes from, not who may check out.
+    """
+    # Pages are requested explicitly (not via auto_paging_iter) so every fetch
+    # goes through stripe_call's rate-limit retries
+    count = 0
+    params = {"customer": customer_id, "status": "all", "limit": 100}
+    while True:
+        page = await async_stripe_call(stripe.Subscription.list, **params)
+        count += len(page.data)
+        if not page.has_more or not page.data:
+            return count
+        params["starting_after"] = page.data[-1].id
 
-import logging
-logger = logging.getLogger(__name__)
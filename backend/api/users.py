@@ -71,7 +71,7 @@ async def delete_user_data(
     """
     try:
         # Check if user exists
-        user = db.query(AnonymousUser).filter(AnonymousUser.id == anonymous_id).first()
+        user = db.get(AnonymousUser, anonymous_id)
         if not user:
             logger.warning(f"Delete request for non-existent user: {redact_anonymous_id(anonymous_id)}")
             raise HTTPException(
@@ -203,7 +203,7 @@ async def get_user_data_summary(
     """
     try:
         # Check if user exists
-        user = db.query(AnonymousUser).filter(AnonymousUser.id == anonymous_id).first()
+        user = db.get(AnonymousUser, anonymous_id)
         if not user:
             raise HTTPException(
                 status_code=404,
@@ -279,7 +279,7 @@ async def get_user_profile(
     """
     try:
         # Check if user exists
-        user = db.query(AnonymousUser).filter(AnonymousUser.id == anonymous_id).first()
+        user = db.get(AnonymousUser, anonymous_id)
         if not user:
             raise HTTPException(
                 status_code=404,
@@ -342,7 +342,7 @@ async def update_user_profile(
     """
     try:
         # Check if user exists, create if not
-        user = db.query(AnonymousUser).filter(AnonymousUser.id == anonymous_id).first()
+        user = db.get(AnonymousUser, anonymous_id)
         if not user:
             user = AnonymousUser(
                 id=anonymous_id,
@@ -373,11 +373,15 @@ async def update_user_profile(
         experience_summary = "\n".join(experience_parts) if experience_parts else None
         
         if profile:
-            # Update existing profile
-            profile.skills = request.skills
-            profile.projects = projects
-            profile.experience_summary = experience_summary
-            profile.updated_at = datetime.utcnow()
+            # Update existing profile. A resubmitted, unchanged profile is left
+            # as is, so it costs no row UPDATE and keeps its updated_at
+            if (profile.skills, profile.projects, profile.experience_summary) != (
+                request.skills, projects, experience_summary
+            ):
+                profile.skills = request.skills
+                profile.projects = projects
+                profile.experience_summary = experience_summary
+                profile.updated_at = datetime.utcnow()
         else:
             # Create new profile
             profile = LLCProfile(
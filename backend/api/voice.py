@@ -4,16 +4,122 @@ Handles incoming voice calls and provides TwiML responses.
 """
 from fastapi import APIRouter, Request, Form, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.responses import Response
-from typing import Optional
+from typing import Optional, Union
+from string import Template
+from xml.sax.saxutils import escape
+import asyncio
 import logging
 import json
 
+from config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# ConversationRelay frames are parsed/encoded with orjson when available;
+# orjson.JSONDecodeError subclasses json.JSONDecodeError so handlers are unchanged
+if orjson is not None:
+    _json_loads = orjson.loads
+
+    def _json_dumps(data) -> str:
+        return orjson.dumps(data).decode()
+else:
+    _json_loads = json.loads
+
+    def _json_dumps(data) -> str:
+        # Same compact encoding as WebSocket.send_json
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
 router = APIRouter(prefix="/api/voice", tags=["voice"])
 
+# Seconds to wait for queued replies to be written when a call's socket closes
+OUTBOX_DRAIN_TIMEOUT = 2.0
+
+
+class CallConnection:
+    """
+    A ConversationRelay websocket with a single writer task.
+
+    Replies are queued with send() and written in order by the writer, so the
+    receive loop never waits on a websocket write.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.outbox: asyncio.Queue = asyncio.Queue()
+        self.writer = asyncio.create_task(self._write_loop())
+
+    def send(self, message: Union[dict, str]) -> None:
+        """Queue a message (a dict, or an already JSON-encoded str) for the caller."""
+        self.outbox.put_nowait(message)
+
+    async def _write_loop(self):
+        try:
+            while True:
+                message = await self.outbox.get()
+                try:
+                    await self.websocket.send_text(message if isinstance(message, str) else _json_dumps(message))
+                finally:
+                    self.outbox.task_done()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"WebSocket writer stopped: {e}")
+
+    async def close(self):
+        """Flush queued replies (bounded by OUTBOX_DRAIN_TIMEOUT) and stop the writer."""
+        if not self.writer.done():
+            try:
+                await asyncio.wait_for(self.outbox.join(), OUTBOX_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("Timed out flushing queued WebSocket messages")
+        self.writer.cancel()
+
+
 # Store active websocket connections
-active_connections: dict[str, WebSocket] = {}
+active_connections: dict[str, CallConnection] = {}
+
+
+# ElevenLabs voice ID
+ELEVENLABS_VOICE = "NYC9WEgkq1u4jiqBseQ9-turbo_v2_5-0.8_0.8_0.6"
+
+# Twilio Say voice used when ConversationRelay is not in use
+SAY_VOICE_ATTRS = 'language="en-US" voice="Polly.Joanna-Neural"'
+
+# TwiML documents are compiled once; values are XML-escaped before substitution
+_TWIML_RELAY = Template(
+    '<?xml version="1.0" encoding="UTF-8"?>\n<Response>\n'
+    '  <Connect>\n'
+    '    <ConversationRelay url="${url}" ttsProvider="ElevenLabs" voice="${voice}" '
+    'enableAutopilot="false" enableVoiceActivityDetection="true" />\n'
+    '  </Connect>\n'
+    '</Response>'
+)
+
+_TWIML_GATHER = Template(
+    '<?xml version="1.0" encoding="UTF-8"?>\n<Response>\n'
+    '  <Gather action="${action}" numDigits="${num_digits}" timeout="10">\n'
+    f'    <Say {SAY_VOICE_ATTRS}>${{message}}</Say>\n'
+    '  </Gather>\n'
+    # Fallback if no input
+    f'  <Say {SAY_VOICE_ATTRS}>We didn\'t receive any input. Goodbye!</Say>\n'
+    '</Response>'
+)
+
+_TWIML_SAY = Template(
+    '<?xml version="1.0" encoding="UTF-8"?>\n<Response>\n'
+    f'  <Say {SAY_VOICE_ATTRS}>${{message}}</Say>\n'
+    '</Response>'
+)
+
+
+def _xml_attr(value) -> str:
+    """Escape a value for use inside a double-quoted XML attribute."""
+    return escape(str(value), {'"': "&quot;"})
 
 
 def generate_twiml_response(message: str, gather: bool = False, 
@@ -33,42 +139,96 @@ def generate_twiml_response(message: str, gather: bool = False,
     Returns:
         TwiML XML string with ElevenLabs voice via ConversationRelay
     """
-    from config import settings
-    
-    # Get websocket URL from config (set via TWILIO_WEBSOCKET_URL env var)
-    websocket_url = settings.TWILIO_WEBSOCKET_URL
-    
-    # ElevenLabs voice ID
-    elevenlabs_voice = "NYC9WEgkq1u4jiqBseQ9-turbo_v2_5-0.8_0.8_0.6"
-    
-    twiml = '<?xml version="1.0" encoding="UTF-8"?>\n<Response>\n'
-    
     if use_conversation_relay:
         # Use ConversationRelay with ElevenLabs for real-time bidirectional conversation
-        twiml += '  <Connect>\n'
-        twiml += f'    <ConversationRelay url="{websocket_url}" '
-        twiml += f'ttsProvider="ElevenLabs" '
-        twiml += f'voice="{elevenlabs_voice}" '
-        twiml += 'enableAutopilot="false" '
-        twiml += 'enableVoiceActivityDetection="true" />\n'
-        twiml += '  </Connect>\n'
-    else:
-        # Fallback to Say with ElevenLabs (if Twilio supports it directly)
-        # Note: Twilio's Say verb doesn't directly support ElevenLabs,
-        # so ConversationRelay is the recommended approach
-        voice_attrs = 'language="en-US" voice="Polly.Joanna-Neural"'
-        
-        if gather:
-            twiml += f'  <Gather action="{gather_action}" numDigits="{gather_num_digits}" timeout="10">\n'
-            twiml += f'    <Say {voice_attrs}>{message}</Say>\n'
-            twiml += '  </Gather>\n'
-            # Fallback if no input
-            twiml += f'  <Say {voice_attrs}>We didn\'t receive any input. Goodbye!</Say>\n'
-        else:
-            twiml += f'  <Say {voice_attrs}>{message}</Say>\n'
+        # Websocket URL comes from config (set via TWILIO_WEBSOCKET_URL env var)
+        return _TWIML_RELAY.substitute(
+            url=_xml_attr(settings.TWILIO_WEBSOCKET_URL),
+            voice=_xml_attr(ELEVENLABS_VOICE)
+        )
     
-    twiml += '</Response>'
-    return twiml
+    # Fallback to Say with Polly (Twilio's Say verb doesn't directly support
+    # ElevenLabs, so ConversationRelay is the recommended approach)
+    if gather:
+        return _TWIML_GATHER.substitute(
+            action=_xml_attr(gather_action),
+            num_digits=_xml_attr(gather_num_digits),
+            message=escape(message)
+        )
+    return _TWIML_SAY.substitute(message=escape(message))
+
+
+# Menu prompts with natural pronunciation
+# Fixed: "L L C" -> "LLC", "A I" -> "AI"
+# Improved phrasing for natural flow
+WELCOME_MESSAGE = (
+    "Welcome to Job Match dot zip, the AI powered job matching platform for LLC owners. "
+    "Press 1 to learn about our services. "
+    "Press 2 to speak with our AI assistant. "
+    "Press 3 to schedule a callback. "
+    "Press 9 to end this call."
+)
+
+MENU_MESSAGES = {
+    "1": (
+        "Job Match helps LLC owners find perfect job matches using AI. "
+        "We analyze your skills, experience, and goals to match you with opportunities. "
+        "Visit jobmatch dot zip to get started. Goodbye!"
+    ),
+    "2": (
+        "Our AI assistant is available on our website at jobmatch dot zip. "
+        "You can chat with our intelligent matching system twenty four seven. "
+        "Visit us online to get started. Goodbye!"
+    ),
+    "3": (
+        "To schedule a callback, please visit jobmatch dot zip and fill out our contact form. "
+        "Our team will reach out within twenty four hours. Goodbye!"
+    ),
+    "9": "Thank you for calling Job Match. Goodbye!",
+}
+INVALID_SELECTION_MESSAGE = "Invalid selection. Please visit jobmatch dot zip for assistance. Goodbye!"
+NO_INPUT_MESSAGE = "We didn't receive any input. Goodbye!"
+
+# Every voice response is static, so the TwiML is rendered once at import
+# Note: ConversationRelay enables bidirectional real-time conversation via websocket
+# The menu system will be handled through the websocket connection
+_WELCOME_TWIML = generate_twiml_response(
+    message=WELCOME_MESSAGE,
+    gather=False,  # ConversationRelay handles interaction via websocket
+    use_conversation_relay=True
+).encode()
+_MENU_TWIML = {
+    digit: generate_twiml_response(message).encode()
+    for digit, message in MENU_MESSAGES.items()
+}
+_INVALID_SELECTION_TWIML = generate_twiml_response(INVALID_SELECTION_MESSAGE).encode()
+_NO_INPUT_TWIML = generate_twiml_response(NO_INPUT_MESSAGE).encode()
+
+# ConversationRelay "media" bodies for the same prompts, JSON-encoded once;
+# only the per-call streamSid is encoded when a frame is sent
+_WELCOME_MEDIA = _json_dumps({"payload": WELCOME_MESSAGE})
+_DTMF_MEDIA = {
+    digit: _json_dumps({"payload": message})
+    for digit, message in MENU_MESSAGES.items()
+}
+_INVALID_SELECTION_MEDIA = _json_dumps({"payload": INVALID_SELECTION_MESSAGE})
+
+
+_STATUS_RECEIVED = b'{"status":"received"}'
+
+
+class TwiMLResponse(Response):
+    """
+    XML response for Twilio webhooks, wrapping the pre-encoded TwiML above.
+    A new instance is built per request: middleware appends headers to the
+    response's header list, so a shared instance would accumulate them.
+    """
+    media_type = "application/xml"
+
+
+def media_frame(call_sid: Optional[str], media_json: str) -> str:
+    """Assemble a TTS media frame around a pre-encoded media body."""
+    return f'{{"event":"media","streamSid":{_json_dumps(call_sid or "unknown")},"media":{media_json}}}'
 
 
 @router.post("/incoming")
@@ -93,27 +253,7 @@ async def handle_incoming_call(
     # Log the incoming call
     logger.info(f"Incoming call - From: {From}, To: {To}, CallSid: {CallSid}, Status: {CallStatus}")
     
-    # Generate welcome message with natural pronunciation
-    # Fixed: "L L C" -> "LLC", "A I" -> "AI"
-    # Improved phrasing for natural flow
-    message = (
-        "Welcome to Job Match dot zip, the AI powered job matching platform for LLC owners. "
-        "Press 1 to learn about our services. "
-        "Press 2 to speak with our AI assistant. "
-        "Press 3 to schedule a callback. "
-        "Press 9 to end this call."
-    )
-    
-    # Generate TwiML with ConversationRelay (ElevenLabs voice)
-    # Note: ConversationRelay enables bidirectional real-time conversation via websocket
-    # The menu system will be handled through the websocket connection
-    twiml = generate_twiml_response(
-        message=message,
-        gather=False,  # ConversationRelay handles interaction via websocket
-        use_conversation_relay=True
-    )
-    
-    return Response(content=twiml, media_type="application/xml")
+    return TwiMLResponse(content=_WELCOME_TWIML)
 
 
 @router.post("/menu")
@@ -132,35 +272,9 @@ async def handle_menu_selection(
     logger.info(f"Menu selection - CallSid: {CallSid}, Digits: {Digits}")
     
     if not Digits:
-        message = "We didn't receive any input. Goodbye!"
-        twiml = generate_twiml_response(message)
-        return Response(content=twiml, media_type="application/xml")
-    
-    # Handle different menu options with natural pronunciation
-    if Digits == "1":
-        message = (
-            "Job Match helps LLC owners find perfect job matches using AI. "
-            "We analyze your skills, experience, and goals to match you with opportunities. "
-            "Visit jobmatch dot zip to get started. Goodbye!"
-        )
-    elif Digits == "2":
-        message = (
-            "Our AI assistant is available on our website at jobmatch dot zip. "
-            "You can chat with our intelligent matching system twenty four seven. "
-            "Visit us online to get started. Goodbye!"
-        )
-    elif Digits == "3":
-        message = (
-            "To schedule a callback, please visit jobmatch dot zip and fill out our contact form. "
-            "Our team will reach out within twenty four hours. Goodbye!"
-        )
-    elif Digits == "9":
-        message = "Thank you for calling Job Match. Goodbye!"
-    else:
-        message = "Invalid selection. Please visit jobmatch dot zip for assistance. Goodbye!"
+        return TwiMLResponse(content=_NO_INPUT_TWIML)
     
-    twiml = generate_twiml_response(message)
-    return Response(content=twiml, media_type="application/xml")
+    return TwiMLResponse(content=_MENU_TWIML.get(Digits, _INVALID_SELECTION_TWIML))
 
 
 @router.post("/status")
@@ -184,7 +298,7 @@ async def handle_call_status(
     # You could store call logs in database here
     # await store_call_log(CallSid, CallStatus, CallDuration)
     
-    return {"status": "received"}
+    return Response(content=_STATUS_RECEIVED, media_type="application/json")
 
 
 @router.websocket("/websocket")
@@ -199,6 +313,7 @@ async def websocket_endpoint(websocket: WebSocket):
     - Handles conversation flow and menu navigation
     """
     await websocket.accept()
+    connection = CallConnection(websocket)
     call_sid = None
     
     try:
@@ -207,32 +322,25 @@ async def websocket_endpoint(websocket: WebSocket):
         logger.info(f"WebSocket connection established: {initial_message[:200]}")
         
         try:
-            data = json.loads(initial_message)
+            data = _json_loads(initial_message)
             call_sid = data.get("event", {}).get("callSid") or data.get("callSid")
             if call_sid:
-                active_connections[call_sid] = websocket
+                active_connections[call_sid] = connection
                 logger.info(f"Registered WebSocket connection for CallSid: {call_sid}")
         except json.JSONDecodeError:
             logger.warning(f"Non-JSON initial message: {initial_message[:100]}")
         
         # Send welcome message via TTS
-        welcome_message = {
-            "event": "media",
-            "streamSid": call_sid or "unknown",
-            "media": {
-                "payload": "Welcome to Job Match dot zip, the AI powered job matching platform for LLC owners. Press 1 to learn about our services. Press 2 to speak with our AI assistant. Press 3 to schedule a callback. Press 9 to end this call."
-            }
-        }
-        await websocket.send_json(welcome_message)
+        connection.send(media_frame(call_sid, _WELCOME_MEDIA))
         
         # Handle incoming messages from Twilio
         while True:
             try:
                 message = await websocket.receive_text()
-                logger.debug(f"Received WebSocket message: {message[:200]}")
+                logger.debug("Received WebSocket message: %.200s", message)
                 
                 try:
-                    data = json.loads(message)
+                    data = _json_loads(message)
                     event_type = data.get("event", {}).get("type") or data.get("type")
                     
                     # Handle different event types
@@ -249,7 +357,7 @@ async def websocket_endpoint(websocket: WebSocket):
                         # Handle DTMF (keypad) input
                         digit = data.get("dtmf", {}).get("digit") or data.get("digit")
                         if digit:
-                            await handle_dtmf_input(websocket, digit, call_sid)
+                            handle_dtmf_input(connection, digit, call_sid)
                     
                 except json.JSONDecodeError:
                     # Handle non-JSON messages (could be binary audio data)
@@ -268,34 +376,19 @@ async def websocket_endpoint(websocket: WebSocket):
         if call_sid and call_sid in active_connections:
             del active_connections[call_sid]
             logger.info(f"Removed WebSocket connection for CallSid: {call_sid}")
+        await connection.close()
         try:
             await websocket.close()
         except:
             pass
 
 
-async def handle_dtmf_input(websocket: WebSocket, digit: str, call_sid: Optional[str]):
+def handle_dtmf_input(connection: CallConnection, digit: str, call_sid: Optional[str]):
     """Handle DTMF (keypad) input from caller."""
     logger.info(f"DTMF input received: {digit} (CallSid: {call_sid})")
     
-    responses = {
-        "1": "Job Match helps LLC owners find perfect job matches using AI. We analyze your skills, experience, and goals to match you with opportunities. Visit jobmatch dot zip to get started. Goodbye!",
-        "2": "Our AI assistant is available on our website at jobmatch dot zip. You can chat with our intelligent matching system twenty four seven. Visit us online to get started. Goodbye!",
-        "3": "To schedule a callback, please visit jobmatch dot zip and fill out our contact form. Our team will reach out within twenty four hours. Goodbye!",
-        "9": "Thank you for calling Job Match. Goodbye!"
-    }
-    
-    message = responses.get(digit, "Invalid selection. Please visit jobmatch dot zip for assistance. Goodbye!")
-    
     # Send response via TTS
-    response_message = {
-        "event": "media",
-        "streamSid": call_sid or "unknown",
-        "media": {
-            "payload": message
-        }
-    }
-    await websocket.send_json(response_message)
+    connection.send(media_frame(call_sid, _DTMF_MEDIA.get(digit, _INVALID_SELECTION_MEDIA)))
 
 
 @router.get("/health")
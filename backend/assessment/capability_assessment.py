@@ -46,11 +46,10 @@ class CapabilityAssessmentEngine:
         )
         
         self.db.add(assessment)
-        self.db.commit()
-        self.db.refresh(assessment)
+        self.db.flush()
         
-        # Create checkpoint for state recovery
-        checkpoint = self.state_manager.create_checkpoint(
+        # Create checkpoint for state recovery (committed with the assessment)
+        checkpoint = self.state_manager.stage_checkpoint(
             checkpoint_type=CheckpointType.ASSESSMENT,
             entity_id=str(assessment.id),
             state_data={
@@ -173,9 +172,7 @@ class CapabilityAssessmentEngine:
         feedback: Optional[str] = None
     ) -> CapabilityAssessment:
         """Human reviewer validates/refines assessment."""
-        assessment = self.db.query(CapabilityAssessment).filter(
-            CapabilityAssessment.id == assessment_id
-        ).first()
+        assessment = self.db.get(CapabilityAssessment, assessment_id)
         
         if not assessment:
             raise ValueError(f"Assessment {assessment_id} not found")
@@ -188,11 +185,8 @@ class CapabilityAssessmentEngine:
             assessment.results["human_feedback"] = feedback
             assessment.results["human_decision"] = review_decision
         
-        self.db.commit()
-        self.db.refresh(assessment)
-        
-        # Create new checkpoint after human review
-        checkpoint = self.state_manager.create_checkpoint(
+        # Create new checkpoint after human review (committed with the review)
+        checkpoint = self.state_manager.stage_checkpoint(
             checkpoint_type=CheckpointType.ASSESSMENT,
             entity_id=str(assessment.id),
             state_data={
@@ -213,9 +207,7 @@ class CapabilityAssessmentEngine:
     
     def get_assessment(self, assessment_id: int) -> Optional[CapabilityAssessment]:
         """Get assessment by ID."""
-        return self.db.query(CapabilityAssessment).filter(
-            CapabilityAssessment.id == assessment_id
-        ).first()
+        return self.db.get(CapabilityAssessment, assessment_id)
     
     def list_user_assessments(self, user_id: str) -> List[CapabilityAssessment]:
         """List all assessments for a user."""
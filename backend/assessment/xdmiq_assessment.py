@@ -86,11 +86,10 @@ class XDMIQAssessmentEngine:
             )
             
             self.db.add(assessment)
-            self.db.commit()
-            self.db.refresh(assessment)
+            self.db.flush()
             
-            # Create checkpoint
-            checkpoint = self.state_manager.create_checkpoint(
+            # Create checkpoint (committed with the assessment)
+            checkpoint = self.state_manager.stage_checkpoint(
                 checkpoint_type=CheckpointType.ASSESSMENT,
                 entity_id=str(assessment.id),
                 state_data={
@@ -4,7 +4,6 @@ Generates persistent anonymous IDs without revealing real identity.
 Zero-knowledge architecture: platform cannot link anonymous IDs to real identities.
 """
 import secrets
-import hashlib
 import logging
 from datetime import datetime
 from typing import Optional
@@ -26,11 +25,8 @@ class AnonymousIdentityManager:
         Generate a cryptographically secure anonymous ID.
         Uses secrets module for secure random generation.
         """
-        # Generate 32 bytes of random data
-        random_bytes = secrets.token_bytes(32)
-        # Create a hash for consistent length
-        anonymous_id = hashlib.sha256(random_bytes).hexdigest()
-        return anonymous_id
+        # 32 random bytes as 64 hex chars (same shape as the old SHA-256 digest)
+        return secrets.token_hex(32)
     
     def create_anonymous_user(
         self,
@@ -3,6 +3,7 @@ Email Provider Integration.
 Supports SMTP and Amazon SES email service providers.
 """
 import logging
+import re
 from typing import Dict, Any, Optional
 import smtplib
 from email.mime.text import MIMEText
@@ -15,6 +16,9 @@ from security.pii_redaction import redact_email
 
 logger = logging.getLogger(__name__)
 
+# Compiled once; validate_email runs per address on bulk sends
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
 
 class EmailProviderManager:
     """Manages email provider integrations."""
@@ -216,9 +220,7 @@ class EmailProviderManager:
     
     def validate_email(self, email: str) -> bool:
         """Validate email format."""
-        import re
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return bool(re.match(pattern, email))
+        return bool(EMAIL_PATTERN.match(email))
 
 
 def create_email_manager() -> EmailProviderManager:
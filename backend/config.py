@@ -65,6 +65,21 @@ class Settings(BaseSettings):
                 sys.exit(1)
         return self
     
+    @model_validator(mode='after')
+    def validate_stripe_keys(self):
+        """Fail fast at startup if Stripe credentials are missing in production."""
+        if self.ENVIRONMENT.lower() not in ["development", "dev", "test"]:
+            missing = [name for name in ("STRIPE_SECRET_KEY", "STRIPE_WEBHOOK_SECRET") if not getattr(self, name)]
+            if missing:
+                print("\n" + "="*80, file=sys.stderr)
+                print(f"CRITICAL ERROR: {', '.join(missing)} environment variable not set!", file=sys.stderr)
+                print("="*80, file=sys.stderr)
+                print("\nFor production, set STRIPE_SECRET_KEY=sk_live_... and STRIPE_WEBHOOK_SECRET=whsec_...", file=sys.stderr)
+                print("For testing, set STRIPE_SECRET_KEY=sk_test_...", file=sys.stderr)
+                print("="*80 + "\n", file=sys.stderr)
+                sys.exit(1)
+        return self
+    
     # Development mode - log verification codes to console
     DEV_MODE: bool = True
     
@@ -103,10 +118,22 @@ class Settings(BaseSettings):
     APPLE_CLIENT_ID: str = ""
     APPLE_CLIENT_SECRET: str = ""
     
+    # Stripe
+    # STRIPE_SECRET_KEY and STRIPE_WEBHOOK_SECRET must be set outside development
+    STRIPE_SECRET_KEY: str = ""
+    STRIPE_WEBHOOK_SECRET: str = ""
+    FRONTEND_URL: str = "https://jobmatch.zip"
+    SUPPORT_EMAIL: str = "support@jobmatch.zip"
+    # Count resubscriptions via the Stripe API (authoritative) instead of the
+    # webhook-maintained subscriptions table; both count every status, so this
+    # is for when the table is suspected to lag behind Stripe
+    SUBSCRIPTION_COUNT_FROM_STRIPE: bool = False
+    
     # SMS/VoIP (Twilio)
     TWILIO_ACCOUNT_SID: str = ""
     TWILIO_AUTH_TOKEN: str = ""
     TWILIO_PHONE_NUMBER: str = ""
+    TWILIO_WEBSOCKET_URL: str = "wss://jobmatch.zip/api/voice/websocket"  # ConversationRelay endpoint
     
     # Email (SMTP)
     SMTP_HOST: str = "smtp.gmail.com"
@@ -0,0 +1,17 @@
+-- Migration: Add generated primary_email column to anonymous_users
+-- Date: 2026-10-15
+-- Description: Resolves a user's first linked email in the database so lookups
+-- read one indexed TEXT column instead of fetching and walking the metadata JSON
+
+-- Same precedence as the application: first entry in emails, then Google account email
+ALTER TABLE anonymous_users
+ADD COLUMN IF NOT EXISTS primary_email TEXT GENERATED ALWAYS AS (
+    COALESCE(
+        metadata->'emails'->0->>'address',
+        metadata->'social_accounts'->'google'->'provider_data'->>'email'
+    )
+) STORED;
+
+COMMENT ON COLUMN anonymous_users.primary_email IS 'First linked email (emails[0].address, else Google account email)';
+
+CREATE INDEX IF NOT EXISTS idx_anon_primary_email ON anonymous_users(primary_email);
@@ -0,0 +1,7 @@
+-- Migration: Add partial index for pending human reviews
+-- Date: 2026-10-15
+-- Description: The review queue only ever polls decision = 'pending' rows in
+-- created_at order; a partial index keeps that scan proportional to the backlog
+-- instead of the full review history
+
+CREATE INDEX IF NOT EXISTS idx_reviews_pending ON human_reviews(created_at) WHERE decision = 'pending';
@@ -0,0 +1,7 @@
+-- Migration: Add per-user match score index
+-- Date: 2026-10-15
+-- Description: Match listings read a user's top matches by match_score; a
+-- (user_id, match_score) index serves that as a backward index scan that stops
+-- at the LIMIT instead of sorting every match the user has
+
+CREATE INDEX IF NOT EXISTS idx_matches_user_score ON matches(user_id, match_score);
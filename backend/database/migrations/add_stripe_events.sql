@@ -0,0 +1,12 @@
+-- Migration: Add stripe_events idempotency table
+-- Date: 2026-10-15
+-- Description: Records processed Stripe webhook event ids so redelivered events
+-- are acknowledged without repeating DB writes or emails
+
+CREATE TABLE IF NOT EXISTS stripe_events (
+    event_id VARCHAR(255) PRIMARY KEY,
+    event_type VARCHAR(100),
+    received_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE stripe_events IS 'Stripe webhook event ids already accepted (idempotency keys)';
@@ -3,12 +3,20 @@ SQLAlchemy database models.
 """
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy import Column, String, DateTime, Text, Integer, Boolean, JSON, ForeignKey, Index, Numeric
+from sqlalchemy import Column, Computed, String, DateTime, Text, Integer, Boolean, JSON, ForeignKey, Index, Numeric, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
+# Generated-column expression for AnonymousUser.primary_email
+PRIMARY_EMAIL_SQL = (
+    "COALESCE("
+    "metadata->'emails'->0->>'address', "
+    "metadata->'social_accounts'->'google'->'provider_data'->>'email'"
+    ")"
+)
+
 
 class AnonymousUser(Base):
     """Anonymous user identity."""
@@ -18,11 +26,17 @@ class AnonymousUser(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     last_active = Column(DateTime, default=datetime.utcnow, nullable=False)
     meta_data = Column("metadata", JSON, nullable=True)  # Database column name stays 'metadata', but Python attribute is 'meta_data' to avoid SQLAlchemy reserved name conflict
+    # First linked email (emails[0].address, else Google account email), computed by the database
+    primary_email = Column(Text, Computed(PRIMARY_EMAIL_SQL, persisted=True), nullable=True)
     
     # Relationships
     profiles = relationship("LLCProfile", back_populates="user")
     assessments = relationship("CapabilityAssessment", back_populates="user")
     matches = relationship("Match", back_populates="user")
+    
+    __table_args__ = (
+        Index('idx_anon_primary_email', 'primary_email'),
+    )
 
 
 class LLCProfile(Base):
@@ -83,6 +97,8 @@ class Match(Base):
     
     __table_args__ = (
         Index('idx_user_job', 'user_id', 'job_posting_id'),
+        # Per-user top matches by score (scanned backwards for DESC)
+        Index('idx_matches_user_score', 'user_id', 'match_score'),
     )
 
 
@@ -114,6 +130,11 @@ class HumanReview(Base):
     feedback = Column(Text, nullable=True)
     meta_data = Column("metadata", JSON, nullable=True)  # Database column name stays 'metadata', but Python attribute is 'meta_data' to avoid SQLAlchemy reserved name conflict
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        # Only the pending backlog is polled, FIFO by created_at
+        Index('idx_reviews_pending', 'created_at', postgresql_where=text("decision = 'pending'")),
+    )
 
 
 class ArticulationSuggestion(Base):
@@ -343,3 +364,10 @@ class CreditRequest(Base):
     user = relationship("AnonymousUser", foreign_keys=[anonymous_id])
 
 
+class StripeEvent(Base):
+    """Processed Stripe webhook events (idempotency keys for retried deliveries)."""
+    __tablename__ = "stripe_events"
+    
+    event_id = Column(String(255), primary_key=True)
+    event_type = Column(String(100), nullable=True)
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
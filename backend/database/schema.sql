@@ -6,11 +6,18 @@ CREATE TABLE IF NOT EXISTS anonymous_users (
     id VARCHAR(255) PRIMARY KEY,
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     last_active TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    metadata JSONB
+    metadata JSONB,
+    primary_email TEXT GENERATED ALWAYS AS (
+        COALESCE(
+            metadata->'emails'->0->>'address',
+            metadata->'social_accounts'->'google'->'provider_data'->>'email'
+        )
+    ) STORED
 );
 
 CREATE INDEX idx_anonymous_users_created ON anonymous_users(created_at);
 CREATE INDEX idx_anonymous_users_active ON anonymous_users(last_active);
+CREATE INDEX idx_anon_primary_email ON anonymous_users(primary_email);
 
 -- LLC Profiles (shardable by user_id)
 CREATE TABLE IF NOT EXISTS llc_profiles (
@@ -74,6 +81,7 @@ CREATE INDEX idx_matches_user ON matches(user_id);
 CREATE INDEX idx_matches_job ON matches(job_posting_id);
 CREATE INDEX idx_matches_user_job ON matches(user_id, job_posting_id);
 CREATE INDEX idx_matches_score ON matches(match_score DESC);
+CREATE INDEX idx_matches_user_score ON matches(user_id, match_score);
 CREATE INDEX idx_matches_checkpoint ON matches(checkpoint_id);
 
 -- State Snapshots (for recovery)
@@ -106,6 +114,7 @@ CREATE TABLE IF NOT EXISTS human_reviews (
 CREATE INDEX idx_reviews_type ON human_reviews(review_type);
 CREATE INDEX idx_reviews_entity ON human_reviews(entity_id);
 CREATE INDEX idx_reviews_reviewer ON human_reviews(reviewer_id);
+CREATE INDEX idx_reviews_pending ON human_reviews(created_at) WHERE decision = 'pending';
 
 -- Articulation Suggestions (versioned)
 CREATE TABLE IF NOT EXISTS articulation_suggestions (
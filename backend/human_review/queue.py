@@ -7,6 +7,8 @@ import logging
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
+from sqlalchemy import cast, func, literal, update
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Session
 
 from database.models import HumanReview
@@ -49,13 +51,13 @@ class HumanReviewQueue:
             entity_id=entity_id,
             reviewer_id="",  # Will be assigned when picked up
             decision="pending",
-            metadata=metadata or {},
+            meta_data=metadata or {},
             created_at=datetime.utcnow()
         )
         
+        # No eager refresh; expired attributes reload only if the caller reads them
         self.db.add(review)
         self.db.commit()
-        self.db.refresh(review)
         
         logger.info(f"Added {review_type.value}:{entity_id} to review queue (priority: {priority.value})")
         return review
@@ -93,46 +95,65 @@ class HumanReviewQueue:
         reviewer_id: str,
         decision: str,
         feedback: Optional[str] = None
-    ) -> HumanReview:
-        """Complete a review."""
-        review = self.db.query(HumanReview).filter(
-            HumanReview.id == review_id
-        ).first()
+    ) -> Dict[str, Any]:
+        """
+        Complete a review.
         
-        if not review:
-            raise ValueError(f"Review {review_id} not found")
+        Returns the updated review as a dict built from the RETURNING row before
+        the commit expires it, so reading the result costs no extra SELECT.
+        """
+        # Single UPDATE ... RETURNING; completed_at is merged into the stored
+        # metadata in the database instead of read, modified and written back
+        completed = {"completed_at": datetime.utcnow().isoformat()}
+        stmt = (
+            update(HumanReview)
+            .where(HumanReview.id == review_id, HumanReview.reviewer_id == reviewer_id)
+            .values(
+                decision=decision,
+                feedback=feedback,
+                meta_data=func.coalesce(cast(HumanReview.meta_data, JSONB), literal({}, JSONB))
+                .op("||", return_type=JSONB)(literal(completed, JSONB))
+            )
+            .returning(HumanReview)
+        )
+        review = self.db.scalars(stmt).first()
         
-        if review.reviewer_id != reviewer_id:
+        if not review:
+            self.db.rollback()
+            # Only the failure path pays for a lookup to report why
+            exists = self.db.query(HumanReview.id).filter(HumanReview.id == review_id).first()
+            if not exists:
+                raise ValueError(f"Review {review_id} not found")
             raise ValueError("Review assigned to different reviewer")
         
-        review.decision = decision
-        review.feedback = feedback
-        review.meta_data = (review.meta_data or {})
-        review.meta_data["completed_at"] = datetime.utcnow().isoformat()
-        
+        result = {
+            "id": review.id,
+            "review_type": review.review_type,
+            "entity_id": review.entity_id,
+            "reviewer_id": review.reviewer_id,
+            "decision": review.decision,
+            "feedback": review.feedback,
+            "meta_data": review.meta_data,
+            "created_at": review.created_at,
+        }
         self.db.commit()
-        self.db.refresh(review)
         
         logger.info(f"Review {review_id} completed: {decision}")
-        return review
+        return result
     
     def get_queue_stats(self) -> Dict[str, Any]:
         """Get queue statistics."""
-        total_pending = self.db.query(HumanReview).filter(
-            HumanReview.decision == "pending"
-        ).count()
-        
-        by_type = {}
-        for review_type in ReviewType:
-            count = self.db.query(HumanReview).filter(
-                HumanReview.review_type == review_type.value,
-                HumanReview.decision == "pending"
-            ).count()
-            by_type[review_type.value] = count
+        # One grouped COUNT over the pending index instead of a query per type
+        counts = dict(
+            self.db.query(HumanReview.review_type, func.count(HumanReview.id))
+            .filter(HumanReview.decision == "pending")
+            .group_by(HumanReview.review_type)
+            .all()
+        )
         
         return {
-            "total_pending": total_pending,
-            "by_type": by_type
+            "total_pending": sum(counts.values()),
+            "by_type": {review_type.value: counts.get(review_type.value, 0) for review_type in ReviewType}
         }
 
 
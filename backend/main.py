@@ -1,6 +1,10 @@
 """
 Main FastAPI application entry point.
 """
+import logging
+import logging.handlers
+import queue
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -71,6 +75,35 @@ if agent_ui:
 #     app.include_router(gcp_cli.router)
 
 
+# Application logs go through a queue drained by a background thread so
+# request handlers never block on writing to stdout. Installed at startup, not
+# import, so importing main (tests, workers) leaves process logging alone
+_log_queue = queue.SimpleQueue()
+_log_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_log_listener = None
+
+
+@app.on_event("startup")
+def start_log_listener():
+    """Route root logging through the queue for the lifetime of the app."""
+    global _log_listener
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _log_listener = logging.handlers.QueueListener(_log_queue, stream_handler)
+    root_logger = logging.getLogger()
+    root_logger.addHandler(_log_queue_handler)
+    root_logger.setLevel(logging.INFO)
+    _log_listener.start()
+
+
+@app.on_event("shutdown")
+def stop_log_listener():
+    """Flush queued log records before the process exits."""
+    logging.getLogger().removeHandler(_log_queue_handler)
+    if _log_listener:
+        _log_listener.stop()
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -5,7 +5,7 @@ Implements checkpoint system for all AI decisions with rollback capabilities.
 import json
 import logging
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from enum import Enum
 
 from sqlalchemy import Column, String, DateTime, Text, Integer, JSON
@@ -57,7 +57,7 @@ class StateManager:
     def __init__(self, db_session: Session):
         self.db = db_session
     
-    def create_checkpoint(
+    def _build_checkpoint(
         self,
         checkpoint_type: CheckpointType,
         entity_id: str,
@@ -65,20 +65,69 @@ class StateManager:
         metadata: Optional[Dict[str, Any]] = None,
         created_by: Optional[str] = None
     ) -> StateCheckpoint:
-        """Create a new state checkpoint."""
-        checkpoint = StateCheckpoint(
+        """Construct an (unsaved) checkpoint; shared by the create/stage methods."""
+        return StateCheckpoint(
             checkpoint_type=checkpoint_type.value,
             entity_id=entity_id,
             state_data=state_data,
-            metadata=metadata or {},
+            meta_data=metadata or {},
             created_by=created_by
         )
+    
+    def create_checkpoint(
+        self,
+        checkpoint_type: CheckpointType,
+        entity_id: str,
+        state_data: Dict[str, Any],
+        metadata: Optional[Dict[str, Any]] = None,
+        created_by: Optional[str] = None
+    ) -> StateCheckpoint:
+        """Create a new state checkpoint."""
+        checkpoint = self._build_checkpoint(checkpoint_type, entity_id, state_data, metadata, created_by)
         self.db.add(checkpoint)
         self.db.commit()
         self.db.refresh(checkpoint)
         logger.info(f"Created checkpoint {checkpoint.id} for {checkpoint_type.value}:{entity_id}")
         return checkpoint
     
+    def stage_checkpoint(
+        self,
+        checkpoint_type: CheckpointType,
+        entity_id: str,
+        state_data: Dict[str, Any],
+        created_by: Optional[str] = None
+    ) -> StateCheckpoint:
+        """
+        Stage a checkpoint in the caller's transaction.
+        The flush assigns its id; the caller commits it together with the entity
+        it describes, instead of paying a separate commit and refresh.
+        """
+        checkpoint = self._build_checkpoint(checkpoint_type, entity_id, state_data, created_by=created_by)
+        self.db.add(checkpoint)
+        self.db.flush()
+        logger.info(f"Created checkpoint {checkpoint.id} for {checkpoint_type.value}:{entity_id}")
+        return checkpoint
+    
+    def create_checkpoints(
+        self,
+        checkpoint_type: CheckpointType,
+        entries: List[Tuple[str, Dict[str, Any]]],
+        created_by: Optional[str] = None
+    ) -> List[StateCheckpoint]:
+        """
+        Stage checkpoints for several entities in one flush.
+        entries are (entity_id, state_data) pairs. The checkpoints get their ids
+        but are not committed, so they land in the caller's transaction.
+        """
+        checkpoints = [
+            self._build_checkpoint(checkpoint_type, entity_id, state_data, created_by=created_by)
+            for entity_id, state_data in entries
+        ]
+        self.db.add_all(checkpoints)
+        self.db.flush()
+        logger.info(f"Created {len(checkpoints)} checkpoints for {checkpoint_type.value}")
+        return checkpoints
+    
     def get_latest_checkpoint(
         self,
         checkpoint_type: CheckpointType,
@@ -93,9 +142,7 @@ class StateManager:
     
     def get_checkpoint_by_id(self, checkpoint_id: int) -> Optional[StateCheckpoint]:
         """Get checkpoint by ID."""
-        return self.db.query(StateCheckpoint).filter(
-            StateCheckpoint.id == checkpoint_id
-        ).first()
+        return self.db.get(StateCheckpoint, checkpoint_id)
     
     def list_checkpoints(
         self,
@@ -5,8 +5,11 @@ Test script to create a demo agent and test SSE endpoint
 from backend.api.agent_ui import register_agent
 from src.agents.base_agent import BaseAgent
 from typing import Dict, Any
+import asyncio
+import logging
 import time
-import threading
+
+logger = logging.getLogger(__name__)
 
 class TestAgent(BaseAgent):
     """Simple test agent for SSE testing."""
@@ -32,16 +35,23 @@ test_agent = TestAgent(
 register_agent(test_agent.agent_id, test_agent)
 
 # Simulate state changes in background
-def simulate_state_changes():
+async def simulate_state_changes(agent: BaseAgent = test_agent):
     """Simulate agent state changes every 2 seconds."""
     while True:
-        time.sleep(2)
-        test_agent.act({"action": "test"})
-        print(f"Agent state updated: {test_agent.get_state()}")
+        await asyncio.sleep(2)
+        agent.act({"action": "test"})
+        print(f"Agent state updated: {agent.get_state()}")
 
-# Start background thread
-thread = threading.Thread(target=simulate_state_changes, daemon=True)
-thread.start()
+# Imported into the running server: schedule on its event loop (no thread per agent)
+try:
+    simulation_task = asyncio.get_running_loop().create_task(simulate_state_changes())
+except RuntimeError:
+    simulation_task = None
+    if __name__ != "__main__":
+        logger.warning(
+            "No running event loop; agent state simulation not started. "
+            "Schedule simulate_state_changes() on the server's loop to start it."
+        )
 
 print(f"✅ Test agent registered: {test_agent.agent_id}")
 print(f"✅ Agent state: {test_agent.get_state()}")
@@ -49,3 +59,6 @@ print(f"\n📡 Test SSE endpoint with:")
 print(f"   curl -N -H 'Accept: text/event-stream' http://localhost:8000/api/agents/{test_agent.agent_id}/state/stream")
 print(f"\n🔄 Agent state will update every 2 seconds")
 
+# Run directly: drive the simulation on this process's own event loop
+if simulation_task is None and __name__ == "__main__":
+    asyncio.run(simulate_state_changes())
@@ -13,6 +13,7 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime
 from enum import Enum
 import hashlib
+import secrets
 
 
 class PaymentMethod(Enum):
@@ -114,9 +115,7 @@ class CompensationManager:
         Returns:
             Compensation record ID
         """
-        record_id = hashlib.sha256(
-            f"{session_id}:{datetime.utcnow().isoformat()}".encode()
-        ).hexdigest()[:16]
+        record_id = secrets.token_hex(8)
         
         record = CompensationRecord(
             session_id=session_id,
@@ -389,9 +388,7 @@ class PaymentProcessor:
         Returns:
             Transaction ID
         """
-        transaction_id = hashlib.sha256(
-            f"{amount_usd}:{recipient_identifier}:{datetime.utcnow().isoformat()}".encode()
-        ).hexdigest()[:16]
+        transaction_id = secrets.token_hex(8)
         
         self._transaction_log.append({
             "transaction_id": transaction_id,
@@ -420,9 +417,7 @@ class PaymentProcessor:
             Transaction ID
         """
         btc_amount = amount_usd / current_btc_rate
-        transaction_id = hashlib.sha256(
-            f"{btc_amount}:{btc_address}:{datetime.utcnow().isoformat()}".encode()
-        ).hexdigest()[:16]
+        transaction_id = secrets.token_hex(8)
         
         self._transaction_log.append({
             "transaction_id": transaction_id,
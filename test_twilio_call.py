@@ -5,8 +5,12 @@ Fetches credentials from https://mykeys.zip and makes a test call from 626-995-9
 import os
 import json
 import sys
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
 from twilio.rest import Client
 from twilio.base.exceptions import TwilioException
 
@@ -20,33 +24,45 @@ MYKEYS_URL = os.getenv("MYKEYS_URL", "https://mykeys.zip")
 MYKEYS_USER = os.getenv("MYKEYS_USER", "admin")
 MYKEYS_PASS = os.getenv("MYKEYS_PASS", "XRi6TgSrwfeuK8taYzhknoJc")
 
-def fetch_credentials_from_mykeys(secret_name="twilio-credentials", ecosystem="jobmatch"):
-    """Fetch Twilio credentials from mykeys.zip API."""
-    print(f"[INFO] Fetching credentials from {MYKEYS_URL}...")
-    
-    auth = HTTPBasicAuth(MYKEYS_USER, MYKEYS_PASS)
-    
-    # Try both API endpoint formats
-    endpoints_to_try = [
-        f"{MYKEYS_URL}/api/secrets/{secret_name}",  # Simple format (from credentials.py)
-        f"{MYKEYS_URL}/api/v1/secrets/{ecosystem}/{secret_name}",  # Ecosystem format (from server.js)
-    ]
-    
-    last_error = None
-    for endpoint in endpoints_to_try:
-        try:
-            print(f"[INFO] Trying endpoint: {endpoint}")
-            response = requests.get(
-                endpoint,
-                auth=auth,
-                timeout=10,
-                verify=True
-            )
-        
+# Keep-alive sessions for mykeys.zip requests, one per thread because the
+# endpoints are probed concurrently and requests.Session is not thread-safe.
+# Transient gateway errors are retried by the adapter; the final response is
+# still returned for the status handling below.
+_thread_local = threading.local()
+
+
+def _get_session():
+    """Return this thread's mykeys.zip session, creating it on first use."""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(
+            max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504], raise_on_status=False)
+        ))
+        _thread_local.session = session
+    return session
+
+# Accepted credential key spellings, lowercased (TWILIO_ACCOUNT_SID, account_sid, AccountSid, ...)
+ACCOUNT_SID_KEYS = ("twilio_account_sid", "account_sid", "accountsid")
+AUTH_TOKEN_KEYS = ("twilio_auth_token", "auth_token", "authtoken")
+
+
+def _fetch_from_endpoint(endpoint, auth, secret_name):
+    """Try one mykeys.zip endpoint; returns ((account_sid, auth_token), None) or (None, error)."""
+    try:
+        print(f"[INFO] Trying endpoint: {endpoint}")
+        # Streamed so error responses are not downloaded in full; only a 200 reads the body
+        with _get_session().get(
+            endpoint,
+            auth=auth,
+            timeout=10,
+            verify=True,
+            stream=True
+        ) as response:
             if response.status_code == 200:
                 data = response.json()
                 value = data.get('value', '')
-                
+            
                 # Parse value if it's JSON string
                 if isinstance(value, str):
                     try:
@@ -56,48 +72,63 @@ def fetch_credentials_from_mykeys(secret_name="twilio-credentials", ecosystem="j
                         creds = {'value': value}
                 else:
                     creds = value if isinstance(value, dict) else {'value': value}
-                
-                # Extract credentials in various possible formats
-                twilio_account_sid = (
-                    creds.get('TWILIO_ACCOUNT_SID') or 
-                    creds.get('twilio_account_sid') or 
-                    creds.get('account_sid') or
-                    creds.get('AccountSid') or
-                    creds.get('accountSid')
-                )
-                twilio_auth_token = (
-                    creds.get('TWILIO_AUTH_TOKEN') or 
-                    creds.get('twilio_auth_token') or 
-                    creds.get('auth_token') or
-                    creds.get('AuthToken') or
-                    creds.get('authToken')
-                )
-                
+            
+                # Extract credentials in various possible formats (key case is ignored)
+                normalized = {str(key).lower(): val for key, val in creds.items()}
+                twilio_account_sid = next((normalized[k] for k in ACCOUNT_SID_KEYS if normalized.get(k)), None)
+                twilio_auth_token = next((normalized[k] for k in AUTH_TOKEN_KEYS if normalized.get(k)), None)
+            
                 if twilio_account_sid and twilio_auth_token:
                     print(f"[SUCCESS] Retrieved Twilio credentials from mykeys.zip using: {endpoint}")
-                    return twilio_account_sid, twilio_auth_token
+                    return (twilio_account_sid, twilio_auth_token), None
                 else:
                     print(f"[WARN] Credentials found but missing required fields")
                     print(f"   Available keys: {list(creds.keys())}")
-                    last_error = ValueError("Twilio credentials incomplete - missing account_sid or auth_token")
-                    continue  # Try next endpoint
-                    
+                    return None, ValueError("Twilio credentials incomplete - missing account_sid or auth_token")
+                
             elif response.status_code == 404:
-                last_error = FileNotFoundError(f"Secret '{secret_name}' not found at {endpoint}")
-                continue  # Try next endpoint
+                return None, FileNotFoundError(f"Secret '{secret_name}' not found at {endpoint}")
             elif response.status_code == 401:
-                last_error = ValueError("Authentication failed - check mykeys.zip credentials")
-                continue  # Try next endpoint
+                return None, ValueError("Authentication failed - check mykeys.zip credentials")
             elif response.status_code == 502:
-                last_error = ConnectionError(f"Bad Gateway (502) - mykeys.zip service may be down or unreachable")
-                continue  # Try next endpoint
+                return None, ConnectionError(f"Bad Gateway (502) - mykeys.zip service may be down or unreachable")
             else:
-                last_error = ValueError(f"HTTP {response.status_code} from {endpoint}: {response.text[:200]}")
-                continue  # Try next endpoint
-                
-        except requests.exceptions.RequestException as e:
-            last_error = e
-            continue  # Try next endpoint
+                preview = next(response.iter_content(200), b"").decode(response.encoding or "utf-8", errors="replace")
+                return None, ValueError(f"HTTP {response.status_code} from {endpoint}: {preview}")
+            
+    except requests.exceptions.RequestException as e:
+        return None, e
+
+
+def fetch_credentials_from_mykeys(secret_name="twilio-credentials", ecosystem="jobmatch"):
+    """Fetch Twilio credentials from mykeys.zip API."""
+    print(f"[INFO] Fetching credentials from {MYKEYS_URL}...")
+    
+    auth = HTTPBasicAuth(MYKEYS_USER, MYKEYS_PASS)
+    
+    # Try both API endpoint formats
+    endpoints_to_try = [
+        f"{MYKEYS_URL}/api/secrets/{secret_name}",  # Simple format (from credentials.py)
+        f"{MYKEYS_URL}/api/v1/secrets/{ecosystem}/{secret_name}",  # Ecosystem format (from server.js)
+    ]
+    
+    # Probe the endpoints concurrently but take results in preference order: the
+    # first endpoint wins whenever it has credentials, and the second one's
+    # answer is already in flight if it doesn't
+    last_error = None
+    executor = ThreadPoolExecutor(max_workers=len(endpoints_to_try))
+    try:
+        futures = [
+            executor.submit(_fetch_from_endpoint, endpoint, auth, secret_name)
+            for endpoint in endpoints_to_try
+        ]
+        for future in futures:
+            credentials, last_error = future.result()
+            if credentials:
+                return credentials
+    finally:
+        # Don't wait on a slower, less preferred endpoint once we have an answer
+        executor.shutdown(wait=False, cancel_futures=True)
     
     # If we get here, all endpoints failed
     if isinstance(last_error, FileNotFoundError):